@@ -13,10 +13,12 @@ setup(
         "singer-python==6.3.0",
         "requests==2.32.5",
     ],
-    extras_require={"dev": ["pylint"]},
+    extras_require={"dev": ["pylint"], "zstd": ["zstandard"], "parquet": ["pyarrow"], "http2": ["httpx[http2]"]},
     entry_points="""
     [console_scripts]
     tap-circle-ci=tap_circle_ci:main
+    tap-circle-ci-merge-states=tap_circle_ci.sharding:main
+    tap-circle-ci-send-webhook=tap_circle_ci.webhooks:main
     """,
     packages=find_packages(exclude=["tests"]),
     package_data={
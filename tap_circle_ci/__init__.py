@@ -1,26 +1,37 @@
 #!/usr/bin/env python3
-# pylint: disable=E1121
-"""tap-circle-ci module."""
-import sys
+# pylint: disable=E1121,C0415
+"""tap-circle-ci module.
 
-from singer import get_logger, utils
-from singer.metrics import Counter, Timer
+Imports are deferred to the code paths that need them, importing the
+package itself does not load `singer` or any of the stream modules.
+"""
 
-from tap_circle_ci.discover import discover
-from tap_circle_ci.sync import sync
+REQUIRED_CONFIG_KEYS = ["start_date", "token"]
 
-REQUIRED_CONFIG_KEYS = ["start_date", "token", "project_slugs"]
-LOGGER = get_logger()
 
-
-@utils.handle_top_exception(LOGGER)
-def main():
-    """performs sync and/or discovery."""
-    args = utils.parse_args(REQUIRED_CONFIG_KEYS)
+def run(args) -> None:
+    """performs sync and/or discovery for the parsed arguments."""
     if args.discover:
+        from tap_circle_ci.discover import discover
+
         discover(args.config).dump()
     else:
-        sync(args.config, args.state, args.catalog or discover(args.config))
+        from tap_circle_ci.discover import discover
+        from tap_circle_ci.sync import sync
+
+        # the credentials are verified by the sync itself, skip the `/me` call of discovery
+        sync(args.config, args.state, args.catalog or discover(args.config, auth_check=False))
+
+
+def main():
+    """performs sync and/or discovery."""
+    from singer import get_logger, utils
+
+    @utils.handle_top_exception(get_logger())
+    def _main():
+        run(utils.parse_args(REQUIRED_CONFIG_KEYS))
+
+    _main()
 
 
 if __name__ == "__main__":
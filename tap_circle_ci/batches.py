@@ -0,0 +1,124 @@
+"""tap-circle-ci batch file module."""
+import gzip
+import os
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Mapping
+
+import simplejson
+from singer import SingerConfigurationError, get_logger
+
+LOGGER = get_logger()
+
+COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+# defaults of the `batch_max_records` and `batch_max_bytes` config
+DEFAULT_MAX_RECORDS = 100000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def open_batch_file(path: Path, compression: str):
+    """Opens a batch file for writing text with the configured compression."""
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard  # pylint: disable=C0415
+        except ImportError as err:
+            raise SingerConfigurationError(
+                "`batch_compression` zstd requires the zstandard package, install tap-circle-ci[zstd]"
+            ) from err
+        return zstandard.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+class BatchFileSink:
+    """
+    Writes records to local JSONL batch files and announces them with singer
+    BATCH messages.
+    ~~~
+    Every stream writes to its own batch file under `batch_output_dir`. A file
+    is completed, and its BATCH message written to stdout, once it holds
+    `batch_max_records` records or `batch_max_bytes` uncompressed bytes, and
+    before any other message. So a STATE message always follows the BATCH
+    messages of the records it covers.
+    """
+
+    output = "jsonl"
+
+    def __init__(
+        self,
+        directory: str,
+        compression: str = "gzip",
+        max_records: int = DEFAULT_MAX_RECORDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        if compression not in COMPRESSIONS:
+            raise SingerConfigurationError(
+                f"Invalid `batch_compression` {compression}, expected one of {', '.join(COMPRESSIONS)}"
+            )
+        self.directory = Path(directory).resolve()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.run_id = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._files: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "BatchFileSink":
+        """Returns a sink with the settings of the tap config."""
+        return cls(
+            config["batch_output_dir"],
+            config.get("batch_compression", "gzip"),
+            int(config.get("batch_max_records", DEFAULT_MAX_RECORDS)),
+            int(config.get("batch_max_bytes", DEFAULT_MAX_BYTES)),
+        )
+
+    def write_records(self, stream: str, payload: str, count: int) -> None:
+        """Appends serialized records to the open batch file of a stream."""
+        batch = self._files.get(stream)
+        if batch is None:
+            batch = self._files[stream] = self._open(stream)
+        batch["file"].write(payload)
+        batch["records"] += count
+        batch["bytes"] += len(payload)
+        if batch["records"] >= self.max_records or batch["bytes"] >= self.max_bytes:
+            self._complete(stream)
+
+    def write_message(self, kind: str, text: str) -> None:
+        """Completes the open batch files and writes a serialized message."""
+        # pylint: disable=unused-argument
+        self.flush()
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def flush(self) -> None:
+        """Completes the open batch files."""
+        for stream in list(self._files):
+            self._complete(stream)
+
+    def close(self) -> None:
+        """Completes the open batch files."""
+        self.flush()
+
+    def _open(self, stream: str) -> Dict[str, Any]:
+        self._sequence += 1
+        name = f"{stream}-{self.run_id}-{self._sequence:05d}.jsonl{COMPRESSIONS[self.compression]}"
+        path = self.directory / name
+        return {"path": path, "file": open_batch_file(path, self.compression), "records": 0, "bytes": 0}
+
+    def _complete(self, stream: str) -> None:
+        batch = self._files.pop(stream)
+        batch["file"].close()
+        message = {
+            "type": "BATCH",
+            "stream": stream,
+            "encoding": {"format": "jsonl", "compression": self.compression},
+            "manifest": [batch["path"].as_uri()],
+        }
+        LOGGER.info("Wrote %d %s records to %s", batch["records"], stream, os.fspath(batch["path"]))
+        sys.stdout.write(simplejson.dumps(message) + "\n")
+        sys.stdout.flush()
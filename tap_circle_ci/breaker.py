@@ -0,0 +1,92 @@
+"""tap-circle-ci circuit breaker module."""
+import re
+import threading
+from typing import Any, Dict, Mapping, Optional
+
+from singer import get_logger
+
+from . import exceptions as errors
+
+LOGGER = get_logger()
+
+# endpoint classes, matched in order against the path of a request
+ENDPOINT_CLASSES = (
+    ("job", re.compile(r"/workflow/[^/]+/job")),
+    ("workflow", re.compile(r"/pipeline/[^/]+/workflow")),
+    ("pipeline", re.compile(r"/pipeline")),
+)
+
+# defaults of the `circuit_breaker_threshold` and `retry_budget` config
+DEFAULT_THRESHOLD = 10
+DEFAULT_RETRY_BUDGET = 100
+
+
+def get_endpoint_class(endpoint: str) -> Optional[str]:
+    """Returns the class of an endpoint, failures are tracked per class."""
+    return next((name for name, pattern in ENDPOINT_CLASSES if pattern.search(endpoint)), None)
+
+
+class CircuitBreakers:
+    """
+    Stops a sync that keeps failing instead of retrying every request of
+    the fan-out.
+    ~~~
+    A circuit per endpoint class (pipeline, workflow, job) opens after
+    `circuit_breaker_threshold` consecutive failed requests, a success closes
+    it again. The retries of the whole run are limited to `retry_budget`.
+    Once a circuit is open or the budget is spent, requests fail right away
+    with a `CircuitOpenError`, upon which the sync checkpoints and exits.
+    `0` disables either limit.
+    """
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD, retry_budget: int = DEFAULT_RETRY_BUDGET) -> None:
+        self.threshold = threshold
+        self.retry_budget = retry_budget
+        self.retries = 0
+        self.failures: Dict[str, int] = {}
+        self.error = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "CircuitBreakers":
+        """Returns the breakers with the limits set in the tap config."""
+        return cls(
+            int(config.get("circuit_breaker_threshold", DEFAULT_THRESHOLD)),
+            int(config.get("retry_budget", DEFAULT_RETRY_BUDGET)),
+        )
+
+    def check(self, endpoint: str) -> None:
+        """Raises the error of an open circuit."""
+        if self.error is not None:
+            raise self.error
+        endpoint_class = get_endpoint_class(endpoint)
+        if self.threshold and self.failures.get(endpoint_class, 0) >= self.threshold:
+            raise errors.CircuitOpenError(f"{errors.CircuitOpenError.message}: {endpoint_class} requests failing")
+
+    def record_success(self, endpoint: str) -> None:
+        """Closes the circuit of an endpoint class."""
+        endpoint_class = get_endpoint_class(endpoint)
+        if endpoint_class is not None:
+            with self._lock:
+                self.failures[endpoint_class] = 0
+
+    def record_failure(self, endpoint: str) -> None:
+        """Counts a failed request towards opening its circuit."""
+        endpoint_class = get_endpoint_class(endpoint)
+        if endpoint_class is None:
+            return
+        with self._lock:
+            self.failures[endpoint_class] = self.failures.get(endpoint_class, 0) + 1
+            failures = self.failures[endpoint_class]
+        if self.threshold and failures == self.threshold:
+            LOGGER.error("%d consecutive %s requests failed, opening the circuit", failures, endpoint_class)
+
+    def spend_retry(self) -> None:
+        """Counts a retry against the budget of the run."""
+        with self._lock:
+            self.retries += 1
+            if self.retry_budget and self.retries > self.retry_budget and self.error is None:
+                LOGGER.error("The %d retries of the run are spent", self.retry_budget)
+                self.error = errors.RetryBudgetExhaustedError()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,82 @@
+"""tap-circle-ci run budget module."""
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Mapping, Optional
+
+from singer import get_logger
+
+from . import exceptions as errors
+
+LOGGER = get_logger()
+
+
+class RunBudget:
+    """
+    Limits the wall-clock time and the api requests of a sync.
+    ~~~
+    The budget is checked by the streams each time they write a state
+    message, so the sync stops at a checkpoint it can resume from. The limits
+    are `max_runtime_seconds` and `max_requests`, a SIGTERM received during
+    the sync stops it the same way.
+    """
+
+    def __init__(self, max_runtime: Optional[float] = None, max_requests: Optional[int] = None) -> None:
+        self.max_runtime = max_runtime
+        self.max_requests = max_requests
+        self.started = time.monotonic()
+        self.requests = 0
+        self.stop_reason = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "RunBudget":
+        """Returns the budget set in the tap config."""
+        max_runtime, max_requests = config.get("max_runtime_seconds"), config.get("max_requests")
+        return cls(
+            float(max_runtime) if max_runtime else None,
+            int(max_requests) if max_requests else None,
+        )
+
+    def count_request(self) -> None:
+        """Counts a request sent to the api."""
+        with self._lock:
+            self.requests += 1
+
+    def stop(self, reason: str) -> None:
+        """Stops the sync at its next checkpoint."""
+        if self.stop_reason is None:
+            LOGGER.warning("%s, stopping the sync at the next checkpoint", reason)
+            self.stop_reason = reason
+            self._stopped.set()
+
+    def check(self) -> None:
+        """Raises a `BudgetExhaustedError` once the budget is spent, called
+        right after a checkpoint."""
+        if self.max_runtime and time.monotonic() - self.started >= self.max_runtime:
+            self.stop(f"The sync ran for {self.max_runtime:g} seconds")
+        if self.max_requests and self.requests >= self.max_requests:
+            self.stop(f"The sync sent {self.requests} requests")
+        if self.stop_reason is not None:
+            raise errors.BudgetExhaustedError(self.stop_reason)
+
+    def wait(self, seconds: float) -> None:
+        """Waits between the syncs of a watch, returns early once the sync
+        is stopped or the runtime is spent."""
+        if self.max_runtime:
+            seconds = min(seconds, max(self.max_runtime - (time.monotonic() - self.started), 0))
+        self._stopped.wait(seconds)
+
+    @contextmanager
+    def handle_sigterm(self) -> Iterator[None]:
+        """Turns a SIGTERM into a stop at the next checkpoint."""
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        previous = signal.signal(signal.SIGTERM, lambda *_: self.stop("Received SIGTERM"))
+        try:
+            yield
+        finally:
+            signal.signal(signal.SIGTERM, previous)
@@ -0,0 +1,125 @@
+"""tap-circle-ci http cassette module."""
+import gzip
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import requests
+import simplejson
+from requests.structures import CaseInsensitiveDict
+from singer import SingerConfigurationError, get_logger
+
+from . import exceptions as errors
+
+LOGGER = get_logger()
+
+CASSETTE_MODES = ("record", "replay")
+
+
+def get_request_key(method: str, url: str, params: Optional[Dict]) -> Tuple:
+    """Returns the key a request is recorded and replayed under, request
+    headers, and with them the api token, are left out."""
+    params = sorted((key, str(value)) for key, value in (params or {}).items() if value is not None)
+    return method.upper(), url, tuple(params)
+
+
+class RecordingSession:
+    """
+    Records every request and response of a sync to a gzip compressed
+    cassette.
+    ~~~
+    Each interaction is a json line holding the request, the response and the
+    seconds the response took, in the order the responses were received.
+    """
+
+    def __init__(self, session, path: str) -> None:
+        self.session = session
+        self.path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """Sends a request with the wrapped session and records it."""
+        started = time.monotonic()
+        response = self.session.request(method, url, params=params, **kwargs)
+        latency = time.monotonic() - started
+        interaction = {
+            "method": method.upper(),
+            "url": url,
+            "params": dict(get_request_key(method, url, params)[2]),
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "body": response.text,
+            "latency": round(latency, 6),
+        }
+        with self._lock:
+            self._file.write(simplejson.dumps(interaction) + "\n")
+        return response
+
+    def close(self) -> None:
+        """Completes the cassette and closes the wrapped session."""
+        with self._lock:
+            self._file.close()
+        self.session.close()
+        LOGGER.info("Recorded the http interactions of the sync to %s", self.path)
+
+
+class ReplaySession:
+    """
+    Serves the responses of a recorded cassette instead of calling the api.
+    ~~~
+    Requests are matched by method, url and params. A request sent several
+    times is answered with its recorded responses in order, and then with
+    the last one again. Each response is delayed by its recorded latency
+    divided by `cassette_speed`, `0` replays without any delay.
+    """
+
+    def __init__(self, path: str, speed: float = 1) -> None:
+        self.path = path
+        self.speed = speed
+        self.interactions = defaultdict(deque)
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            for line in cassette:
+                interaction = simplejson.loads(line)
+                key = get_request_key(interaction["method"], interaction["url"], interaction["params"])
+                self.interactions[key].append(interaction)
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, params: Optional[Dict] = None, **_) -> requests.Response:
+        """Returns the recorded response of a request."""
+        key = get_request_key(method, url, params)
+        with self._lock:
+            recorded = self.interactions.get(key)
+            if not recorded:
+                raise errors.CassetteMissError(f"No recorded response for {method} {url} {dict(key[2])}")
+            interaction = recorded.popleft() if len(recorded) > 1 else recorded[0]
+        if self.speed > 0:
+            time.sleep(interaction["latency"] / self.speed)
+        response = requests.Response()
+        response.status_code = interaction["status_code"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = interaction["body"].encode("utf-8")  # pylint: disable=protected-access
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+    def close(self) -> None:
+        """Nothing to release, the cassette is read upfront."""
+
+
+def wrap_session(session, config: Mapping[str, Any]):
+    """Returns the session recording to, or replaying from, the configured
+    `cassette_path`, or the session itself without a `cassette_mode`."""
+    mode = config.get("cassette_mode")
+    if not mode:
+        return session
+    if mode not in CASSETTE_MODES:
+        raise SingerConfigurationError(f"cassette_mode must be one of {', '.join(CASSETTE_MODES)}")
+    if not config.get("cassette_path"):
+        raise SingerConfigurationError("cassette_mode requires a cassette_path")
+    if mode == "record":
+        return RecordingSession(session, config["cassette_path"])
+    session.close()
+    LOGGER.info("Replaying the http interactions recorded in %s", config["cassette_path"])
+    return ReplaySession(config["cassette_path"], float(config.get("cassette_speed", 1)))
@@ -1,15 +1,39 @@
 """tap-circle-ci client module."""
-from typing import Any, Dict, Mapping, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
 
 import backoff
 import requests
-from requests import session
 from singer import get_logger
+from singer.utils import now
 
 from . import exceptions as errors
+from .breaker import CircuitBreakers
+from .budget import RunBudget
+from .concurrency import AdaptiveConcurrency
+from .tokens import TokenPool, TokenState
+from .transport import get_session
 
 logger = get_logger()
 
+# errors retried with backoff, the fetch of a fan-out parent failing with one is deferred
+RETRYABLE_ERRORS = (
+    errors.Http400RequestError,
+    errors.Http500RequestError,
+    errors.Http502RequestError,
+    errors.Http503RequestError,
+    errors.Http504RequestError,
+    requests.ConnectionError,
+)
+DEFERRABLE_ERRORS = RETRYABLE_ERRORS + (errors.Http429RequestError,)
+# errors whose retries are charged to the retry budget, rate limiting is left to the token pool
+BUDGETED_ERRORS = RETRYABLE_ERRORS[1:]
+
+MAX_TRIES = 5
+MAX_RATE_LIMIT_TRIES = 6
+_request_context = threading.local()
+
 
 def raise_for_error(response: requests.Response) -> None:
     """Raises the associated response exception. Takes in a response object,
@@ -31,57 +55,120 @@ def raise_for_error(response: requests.Response) -> None:
             raise errors.ClientError(http_err) from None
 
 
+def is_failing_fast() -> bool:
+    """Checks if the requests of the calling thread are sent without
+    retries."""
+    return getattr(_request_context, "fail_fast", False)
+
+
+def get_max_tries() -> int:
+    """Returns the tries allowed to the requests of the calling thread."""
+    return 1 if is_failing_fast() else MAX_TRIES
+
+
+def get_max_rate_limit_tries() -> int:
+    """Returns the tries allowed to the rate limited requests of the calling
+    thread."""
+    return 1 if is_failing_fast() else MAX_RATE_LIMIT_TRIES
+
+
+@contextmanager
+def fail_fast(enabled: bool = True) -> Iterator[None]:
+    """Sends the requests of the calling thread without retrying errors,
+    for a fetch which is retried later on.
+
+    Threads requesting on behalf of another one, eg: the read-ahead of a
+    paginator, carry its setting over with `fail_fast(is_failing_fast())`.
+    """
+    previous = is_failing_fast()
+    _request_context.fail_fast = enabled
+    try:
+        yield
+    finally:
+        _request_context.fail_fast = previous
+
+
+def spend_retry(details: Dict) -> None:
+    """Backoff handler counting a retry after a server or connection error
+    against the budget of the run."""
+    if isinstance(details.get("exception"), BUDGETED_ERRORS):
+        details["args"][0].breakers.spend_retry()
+
+
 class Client:
     """
     A Wrapper class with support for CircleCi api.
     ~~~
     Performs:
-     - Authentication
+     - Authentication, spread across a pool of api tokens
      - Response parsing
      - HTTP Error handling and retry
     """
 
+    # pylint: disable=R0902
+
     default_response = {"items":[]}
 
     def __init__(self, config: Mapping[str, Any]) -> None:
         self.config = config
-        self._session = session()
-        self._circle_token = self.config.get("token")
+        self._session = get_session(config)
+        self.tokens = TokenPool.from_config(config)
+        self.breakers = CircuitBreakers.from_config(config)
+        self.budget = RunBudget.from_config(config)
+        self.concurrency = AdaptiveConcurrency.from_config(config)
         self.shared_pipeline_ids = None
         self.shared_workflow_ids = None
+        self.shared_org_pipelines = None
+        # `updated_at` of every fetched pipeline, used to skip fan-out to untouched pipelines
+        self.shared_pipeline_updated_at = {}
+        # pipelines of a project whose workflows are missing from `shared_workflow_ids`
+        self.unlisted_pipeline_ids = {}
+        # `(updated_at, workflow ids)` of listed pipelines, kept across the syncs of a watch
+        self.known_workflow_ids = {}
+        # records created since then may be missing from the parent listings of the sync
+        self.cycle_started_at = now()
 
-    def authenticate(self, headers: Optional[dict], params: Optional[dict]) -> Tuple[Dict, Dict]:
+    def start_cycle(self) -> None:
+        """Clears the parent listings of the previous sync of a watch, the
+        connections, token states and known workflows are kept."""
+        self.shared_pipeline_ids = None
+        self.shared_workflow_ids = None
+        self.shared_org_pipelines = None
+        self.unlisted_pipeline_ids = {}
+        self.cycle_started_at = now()
+
+    def close(self) -> None:
+        """Closes the http session of the client."""
+        self._session.close()
+
+    def authenticate(self, headers: Optional[dict], params: Optional[dict], token: TokenState) -> Tuple[Dict, Dict]:
         """Updates Headers and Params based on api version of the stream."""
-        headers.update({"Circle-Token": self._circle_token})
+        headers = {**(headers or {}), "Circle-Token": token.token}
         return headers, params
 
     @backoff.on_exception(wait_gen=backoff.expo, exception=(errors.Http401RequestError,), jitter=None, max_tries=1)
     def get(self, endpoint: str, params: Dict, headers: Dict) -> Any:
         """Calls the make_request method with a prefixed method type `GET`"""
-        headers, params = self.authenticate(headers, params)
         return self.__make_request("GET", endpoint, headers=headers, params=params)
 
     def post(self, endpoint: str, params: Dict, headers: Dict, body: Dict) -> Any:
         """Calls the make_request method with a prefixed method type `POST`"""
         # pylint: disable=R0913
-        headers, params = self.authenticate(headers, params)
         self.__make_request("POST", endpoint, headers=headers, params=params, data=body)
 
     @backoff.on_exception(
         wait_gen=backoff.expo,
-        exception=(
-            errors.Http400RequestError,
-            errors.Http500RequestError,
-            errors.Http502RequestError,
-            errors.Http503RequestError,
-            errors.Http504RequestError,
-            requests.ConnectionError,
-        ),
+        exception=RETRYABLE_ERRORS,
         jitter=None,
-        max_tries=5,
+        max_tries=get_max_tries,
+        on_backoff=spend_retry,
     )
     @backoff.on_exception(
-        wait_gen=backoff.expo, exception=errors.Http429RequestError, jitter=None, max_time=60, max_tries=6
+        wait_gen=backoff.expo,
+        exception=errors.Http429RequestError,
+        jitter=None,
+        max_time=60,
+        max_tries=get_max_rate_limit_tries,
     )
     def __make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Mapping[Any, Any]]:
         """
@@ -96,7 +183,18 @@ class Client:
         Returns:
             Dict,List,None: Returns a `Json Parsed` HTTP Response or None if exception
         """
-        response = self._session.request(method, endpoint, **kwargs)
+        self.breakers.check(endpoint)
+        try:
+            response = self.request_with_token(method, endpoint, **kwargs)
+        except requests.ConnectionError:
+            self.breakers.record_failure(endpoint)
+            self.breakers.check(endpoint)
+            raise
+        if response.status_code >= 500:
+            self.breakers.record_failure(endpoint)
+            self.breakers.check(endpoint)
+        elif response.status_code == 200:
+            self.breakers.record_success(endpoint)
         if response.status_code != 200:
             try:
                 logger.error("Status: %s Message: %s", response.status_code, response.text)
@@ -112,3 +210,41 @@ class Client:
                 return self.default_response
             return None
         return response.json()
+
+    def request_with_token(self, method: str, endpoint: str, headers: Dict, params: Dict, **kwargs):
+        """Sends a request with a token of the pool.
+
+        A request rejected with a 429 or a 401 is sent again right away with
+        another token, as long as one is available.
+        """
+        while True:
+            token = self.tokens.acquire()
+            token_headers, token_params = self.authenticate(headers, params, token)
+            self.budget.count_request()
+            response = self.send(method, endpoint, headers=token_headers, params=token_params, **kwargs)
+            if response.status_code == 429:
+                self.tokens.throttle(token, response.headers)
+                if self.tokens.is_available():
+                    continue
+            elif response.status_code == 401:
+                if self.tokens.revoke(token):
+                    continue
+            elif response.status_code == 200:
+                self.tokens.update(token, response.headers)
+            return response
+
+    def send(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """Sends a request with the session, within the adaptive concurrency
+        limit when `fetch_workers` is set to `auto`."""
+        if self.concurrency is None:
+            return self._session.request(method, endpoint, **kwargs)
+        started, overloaded = self.concurrency.acquire(), False
+        try:
+            response = self._session.request(method, endpoint, **kwargs)
+            overloaded = response.status_code == 429 or response.status_code >= 500
+            return response
+        except requests.ConnectionError:
+            overloaded = True
+            raise
+        finally:
+            self.concurrency.release(started, overloaded)
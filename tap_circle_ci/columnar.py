@@ -0,0 +1,181 @@
+"""tap-circle-ci parquet export module."""
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import simplejson
+from singer import SingerConfigurationError, get_logger
+from singer.utils import strptime_to_utc
+
+from tap_circle_ci.discover import load_schema
+
+LOGGER = get_logger()
+
+# the record key each stream is partitioned by date on
+PARTITION_DATE_KEYS = {"pipelines": "created_at", "workflows": "created_at", "jobs": "started_at"}
+# partition value of records without a project or date, as used by hive
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# default of the `parquet_max_records` config
+DEFAULT_MAX_RECORDS = 100000
+
+
+def import_pyarrow():
+    """Returns the pyarrow modules used by the export, which are an optional
+    dependency."""
+    try:
+        import pyarrow  # pylint: disable=C0415
+        import pyarrow.parquet  # pylint: disable=C0415
+    except ImportError as err:
+        raise SingerConfigurationError(
+            "`parquet_output_dir` requires the pyarrow package, install tap-circle-ci[parquet]"
+        ) from err
+    return pyarrow, pyarrow.parquet
+
+
+def get_type(schema: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """Returns the non null json schema type of a property and its format."""
+    types = schema.get("type") or []
+    types = [types] if isinstance(types, str) else types
+    return next((kind for kind in types if kind != "null"), None), schema.get("format")
+
+
+def arrow_type(pa, schema: Dict):
+    """Returns the arrow type of a json schema property.
+
+    Properties without a single type, eg: `anyOf`, are kept as json strings.
+    """
+    kind, fmt = get_type(schema)
+    if kind == "object" and "properties" in schema:
+        return pa.struct([pa.field(name, arrow_type(pa, prop)) for name, prop in schema["properties"].items()])
+    if kind == "array":
+        return pa.list_(arrow_type(pa, schema.get("items", {})))
+    if kind == "string" and fmt == "date-time":
+        return pa.timestamp("us", tz="UTC")
+    return {"integer": pa.int64(), "number": pa.float64(), "boolean": pa.bool_()}.get(kind, pa.string())
+
+
+def arrow_value(value: Any, schema: Dict) -> Any:
+    """Converts a transformed record value to the arrow type of its
+    property."""
+    # pylint: disable=R0911
+    if value is None:
+        return None
+    kind, fmt = get_type(schema)
+    if kind == "object" and "properties" in schema:
+        return {name: arrow_value(value.get(name), prop) for name, prop in schema["properties"].items()}
+    if kind == "array":
+        return [arrow_value(item, schema.get("items", {})) for item in value]
+    if kind == "string" and fmt == "date-time":
+        return strptime_to_utc(value)
+    if kind == "number":
+        return float(value)
+    if kind in ("integer", "boolean", "string"):
+        return value
+    return value if isinstance(value, str) else simplejson.dumps(value, use_decimal=True)
+
+
+def get_partition(stream: str, record: Dict) -> Tuple[str, str]:
+    """Returns the project and date partition values of a record."""
+    project = record.get("project_slug") or DEFAULT_PARTITION
+    date = record.get(PARTITION_DATE_KEYS.get(stream, "created_at"))
+    return project, date[:10] if date else DEFAULT_PARTITION
+
+
+class ParquetSink:
+    """
+    Writes records to local parquet files partitioned by project and date.
+    ~~~
+    Records are converted to arrow tables using the stream schemas and
+    written to `{parquet_output_dir}/{stream}/project={slug}/date={day}/`,
+    one file per partition every `parquet_max_records` buffered records.
+
+    A STATE message is held back while records handed over before it are
+    still buffered, and written to stdout once their files are complete, so
+    a checkpoint never gets ahead of the exported data.
+    """
+
+    # pylint: disable=R0902
+
+    output = "records"
+
+    def __init__(self, directory: str, compression: str = "snappy", max_records: int = DEFAULT_MAX_RECORDS) -> None:
+        self.pa, self.pq = import_pyarrow()
+        self.directory = Path(directory).resolve()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.max_records = max_records
+        self.run_id = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._schemas: Dict[str, Tuple[Any, Dict]] = {}
+        self._partitions: Dict[Tuple[str, str, str], List[Dict]] = {}
+        self._buffered = 0
+        self._state = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "ParquetSink":
+        """Returns a sink with the settings of the tap config."""
+        return cls(
+            config["parquet_output_dir"],
+            config.get("parquet_compression", "snappy"),
+            int(config.get("parquet_max_records", DEFAULT_MAX_RECORDS)),
+        )
+
+    def get_schema(self, stream: str) -> Tuple[Any, Dict]:
+        """Returns the arrow schema and the json schema of a stream."""
+        if stream not in self._schemas:
+            schema = load_schema(stream)
+            fields = [self.pa.field(name, arrow_type(self.pa, prop)) for name, prop in schema["properties"].items()]
+            self._schemas[stream] = (self.pa.schema(fields), schema)
+        return self._schemas[stream]
+
+    def write_records(self, stream: str, payload: List[Dict], count: int) -> None:
+        """Buffers transformed records by partition."""
+        # pylint: disable=unused-argument
+        for record in payload:
+            self._partitions.setdefault((stream, *get_partition(stream, record)), []).append(record)
+        self._buffered += len(payload)
+        if self._buffered >= self.max_records:
+            self.flush()
+
+    def write_message(self, kind: str, text: str) -> None:
+        """Writes a serialized message, holding back a STATE message until the
+        buffered records are written."""
+        if kind == "STATE" and self._buffered:
+            self._state = text
+            return
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered records and the STATE message held back for
+        them."""
+        for (stream, project, date), records in self._partitions.items():
+            self.write_file(stream, project, date, records)
+        self._partitions, self._buffered = {}, 0
+        if self._state is not None:
+            sys.stdout.write(self._state)
+            sys.stdout.flush()
+            self._state = None
+
+    def close(self) -> None:
+        """Writes the buffered records."""
+        self.flush()
+
+    def write_file(self, stream: str, project: str, date: str, records: List[Dict]) -> Path:
+        """Writes the records of a partition to a new parquet file."""
+        arrow_schema, schema = self.get_schema(stream)
+        rows = [
+            {name: arrow_value(record.get(name), prop) for name, prop in schema["properties"].items()}
+            for record in records
+        ]
+        table = self.pa.Table.from_pylist(rows, schema=arrow_schema)
+        directory = self.directory / stream / f"project={quote(project, safe='')}" / f"date={date}"
+        directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        path = directory / f"part-{self.run_id}-{self._sequence:05d}.parquet"
+        self.pq.write_table(table, path, compression=self.compression)
+        LOGGER.info("Wrote %d %s records to %s", len(records), stream, path)
+        return path
@@ -0,0 +1,97 @@
+"""tap-circle-ci adaptive concurrency module."""
+import threading
+import time
+from typing import Any, Mapping, Optional
+
+from singer import SingerConfigurationError, get_logger, metrics
+
+LOGGER = get_logger()
+
+# `fetch_workers` value enabling the adaptive limit
+AUTO_WORKERS = "auto"
+# default of the `max_fetch_workers` config
+DEFAULT_MAX_WORKERS = 16
+# a response slower than this multiple of the fastest recent responses holds the limit
+LATENCY_TOLERANCE = 2.0
+# weight of a new response in the smoothed baseline latency
+BASELINE_DECAY = 0.05
+
+
+def get_fetch_workers(config: Mapping[str, Any]) -> int:
+    """Returns the number of threads fetching the parents of a fan-out, the
+    most `max_fetch_workers` with `fetch_workers` set to `auto`."""
+    workers = config.get("fetch_workers", 1)
+    if str(workers) == AUTO_WORKERS:
+        return int(config.get("max_fetch_workers", DEFAULT_MAX_WORKERS))
+    return int(workers)
+
+
+class AdaptiveConcurrency:
+    """
+    Limits the requests in flight with an additive increase, multiplicative
+    decrease (AIMD) controller.
+    ~~~
+    Every response below `LATENCY_TOLERANCE` times the baseline latency
+    raises the limit by `1 / limit`, about one more request in flight per
+    round of requests. A 429, 5xx or connection error halves it, at most
+    once per baseline latency so a burst of failures counts once. Slower
+    responses hold the limit. The limit stays between 1 and
+    `max_fetch_workers` and is logged as the `fetch_concurrency` metric
+    whenever it changes.
+    """
+
+    def __init__(self, max_limit: int = DEFAULT_MAX_WORKERS, initial_limit: float = 1) -> None:
+        self.max_limit = max(max_limit, 1)
+        self.limit = min(max(initial_limit, 1), self.max_limit)
+        self.in_flight = 0
+        self.baseline = None
+        self.decreased_at = 0.0
+        self._condition = threading.Condition()
+        self._reported = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> Optional["AdaptiveConcurrency"]:
+        """Returns the controller of the tap config, None unless
+        `fetch_workers` is set to `auto`."""
+        if str(config.get("fetch_workers", 1)) != AUTO_WORKERS:
+            return None
+        max_limit = get_fetch_workers(config)
+        if max_limit < 1:
+            raise SingerConfigurationError("max_fetch_workers must be at least 1")
+        return cls(max_limit)
+
+    def acquire(self) -> float:
+        """Waits for a request to fit in the limit, returns its start time."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, overloaded: bool) -> None:
+        """Adjusts the limit with the outcome of a request, `overloaded` when
+        it was answered with a 429, 5xx or failed to connect."""
+        now = time.monotonic()
+        latency = now - started
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                if now - self.decreased_at >= (self.baseline or 0):
+                    self.limit = max(self.limit / 2, 1)
+                    self.decreased_at = now
+            else:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline += BASELINE_DECAY * (latency - self.baseline)
+                if latency <= LATENCY_TOLERANCE * self.baseline:
+                    self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            self._condition.notify_all()
+            self.report(int(self.limit))
+
+    def report(self, limit: int) -> None:
+        """Logs the limit when it changed."""
+        if limit == self._reported:
+            return
+        self._reported = limit
+        metrics.log(LOGGER, metrics.Point("gauge", "fetch_concurrency", limit, {}))
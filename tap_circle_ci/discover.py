@@ -1,31 +1,54 @@
 """tap-circle-ci discover module."""
+import copy
 import json
-from typing import Dict
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Iterable, Optional
 
 from singer.catalog import Catalog
 
-from tap_circle_ci.client import Client
 from tap_circle_ci.streams import STREAMS
 
+SCHEMAS_DIR = Path(__file__).parent.resolve() / "schemas"
 
-def discover(config: Dict = None):
-    """Performs Discovery for tap-circle-ci."""
-    if config:
+
+@lru_cache(maxsize=None)
+def load_schema(stream_name: str) -> Dict:
+    """Loads the schema of a stream, the file is parsed once per process."""
+    with open(SCHEMAS_DIR / f"{stream_name}.json", encoding="utf-8") as schema_file:
+        return json.load(schema_file)
+
+
+@lru_cache(maxsize=None)
+def get_catalog_entry(stream_name: str) -> Dict:
+    """Builds the catalog entry of a stream, cached once per process."""
+    stream = STREAMS[stream_name]
+    schema = load_schema(stream_name)
+    return {
+        "stream": stream_name,
+        "tap_stream_id": stream.tap_stream_id,
+        "schema": schema,
+        "metadata": stream.get_metadata(schema),
+    }
+
+
+def discover(config: Dict = None, stream_names: Optional[Iterable[str]] = None, auth_check: bool = True):
+    """Performs Discovery for tap-circle-ci.
+
+    The auth check is only performed when a config is passed and
+    `auth_check` is set, `stream_names` limits the catalog to the given
+    streams.
+    """
+    if config and auth_check:
         # permission/auth check
+        from tap_circle_ci.client import Client  # pylint: disable=C0415
+
         client = Client(config)
         client.get("https://circleci.com/api/v2/me", {}, {})
-    streams = []
-    for stream_name, stream in STREAMS.items():
-        schema_path = Path(__file__).parent.resolve() / f"schemas/{stream_name}.json"
-        with open(schema_path, encoding="utf-8") as schema_file:
-            schema = json.load(schema_file)
-        streams.append(
-            {
-                "stream": stream_name,
-                "tap_stream_id": stream.tap_stream_id,
-                "schema": schema,
-                "metadata": stream.get_metadata(schema),
-            }
-        )
+    streams = [copy.deepcopy(get_catalog_entry(stream_name)) for stream_name in stream_names or STREAMS]
+    if (config or {}).get("jobs_source") == "project":
+        # jobs listed from the project builds are replicated by build number
+        for stream in streams:
+            if stream["tap_stream_id"] == "jobs":
+                stream["metadata"] = STREAMS["jobs"].get_project_metadata(stream["schema"])
     return Catalog.from_dict({"streams": streams})
@@ -62,3 +62,25 @@ class Http504RequestError(ClientError):
     """class representing 504 status code."""
 
     message = "API service time out"
+
+
+class CircuitOpenError(ClientError):
+    """class representing an endpoint with sustained failures."""
+
+    message = "Too many failed requests, stopping the sync"
+
+
+class RetryBudgetExhaustedError(CircuitOpenError):
+    """class representing a run out of retries."""
+
+    message = "The retry budget of the run is exhausted, stopping the sync"
+
+
+class BudgetExhaustedError(Exception):
+    """class representing a sync stopped by its time or request budget."""
+
+
+class CassetteMissError(ClientError):
+    """class representing a request missing from the replayed cassette."""
+
+    message = "No recorded response for the request"
@@ -0,0 +1,95 @@
+"""tap-circle-ci bounded queue module."""
+import threading
+from collections import deque
+from typing import Any, Optional
+
+# defaults of the `max_buffered_records` and `max_buffered_bytes` config
+DEFAULT_MAX_RECORDS = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class QueueClosed(Exception):
+    """Raised when putting an item into a closed queue."""
+
+
+class BoundedQueue:
+    """
+    A FIFO queue between the stages of a sync, bounded by the number of
+    records and the bytes held by its items.
+    ~~~
+    `put` blocks while adding an item would exceed either limit, so a slow
+    consumer pauses its producers. An item over the limits on its own is
+    still accepted by an empty queue. Room for an item can be reserved
+    before it is put, eg: by a fetch thread once its result is complete,
+    while the results are put in order by another thread.
+    """
+
+    def __init__(self, max_records: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.records = 0
+        self.bytes = 0
+        self._items = deque()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config) -> "BoundedQueue":
+        """Returns a queue with the limits set in the tap config."""
+        return cls(
+            int(config.get("max_buffered_records", DEFAULT_MAX_RECORDS)),
+            int(config.get("max_buffered_bytes", DEFAULT_MAX_BYTES)),
+        )
+
+    def is_full(self, records: int, size: int) -> bool:
+        """Checks if an item of `records` records and `size` bytes would
+        exceed the limits."""
+        if not self._items:
+            return False
+        if self.max_records and self.records + records > self.max_records:
+            return True
+        return bool(self.max_bytes and self.bytes + size > self.max_bytes)
+
+    def reserve(self, records: int = 0, size: int = 0) -> None:
+        """Counts an item of `records` records and `size` bytes before it is
+        put, waiting for room if the queue is full."""
+        with self._condition:
+            while not self._closed and self.is_full(records, size):
+                self._condition.wait()
+            if self._closed:
+                raise QueueClosed
+            self.records += records
+            self.bytes += size
+
+    def put(self, item: Any, records: int = 0, size: int = 0, reserved: bool = False) -> None:
+        """Adds an item, waiting for room if the queue is full, unless room
+        was reserved for it."""
+        with self._condition:
+            if not reserved:
+                while not self._closed and self.is_full(records, size):
+                    self._condition.wait()
+            if self._closed:
+                raise QueueClosed
+            self._items.append((item, records, size))
+            if not reserved:
+                self.records += records
+                self.bytes += size
+            self._condition.notify_all()
+
+    def get(self) -> Any:
+        """Removes and returns the oldest item, waiting for one if the queue
+        is empty."""
+        with self._condition:
+            while not self._items:
+                self._condition.wait()
+            item, records, size = self._items.popleft()
+            self.records -= records
+            self.bytes -= size
+            self._condition.notify_all()
+            return item
+
+    def close(self) -> None:
+        """Stops accepting items and wakes up the blocked producers."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
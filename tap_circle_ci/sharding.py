@@ -0,0 +1,83 @@
+"""tap-circle-ci sharding module.
+
+A project's history can be split between several tap processes with the
+`shard_count` and `shard_index` config keys. Pipelines are assigned to a
+shard by a stable hash of their id, so every process syncs a disjoint set
+of pipelines along with their workflows and jobs and keeps its own state.
+The states of all the shards can be combined with `merge_states` once the
+backfill is complete.
+"""
+import json
+import sys
+import zlib
+from typing import Dict, Mapping, Optional, Tuple
+
+from singer import SingerConfigurationError
+
+# bookmarks tracking an unfinished sync, they are only meaningful for the shard that wrote them
+IN_PROGRESS_KEYS = {"currently_syncing", "page_cursor"}
+# streams whose bookmarks are held back below unfinished records, the earliest one is kept
+HELD_BACK_STREAMS = {"jobs"}
+
+
+def get_shard(config: Mapping) -> Optional[Tuple[int, int]]:
+    """Returns the `(shard_index, shard_count)` of the process, None if the
+    sync is not sharded."""
+    if config.get("shard_count") in (None, ""):
+        return None
+    shard_count, shard_index = int(config["shard_count"]), int(config.get("shard_index", 0))
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise SingerConfigurationError(f"Invalid shard_index {shard_index} for shard_count {shard_count}")
+    return shard_index, shard_count
+
+
+def in_shard(pipeline_id: str, shard: Optional[Tuple[int, int]]) -> bool:
+    """Checks if a pipeline is assigned to the shard."""
+    if shard is None:
+        return True
+    shard_index, shard_count = shard
+    return zlib.crc32(pipeline_id.encode("utf-8")) % shard_count == shard_index
+
+
+def merge_values(value, other, pick=max):
+    """Merges two bookmark values with `pick`, mappings are merged key by
+    key."""
+    if isinstance(value, dict) and isinstance(other, dict):
+        merged = dict(value)
+        for key, other_value in other.items():
+            merged[key] = merge_values(merged[key], other_value, pick) if key in merged else other_value
+        return merged
+    return pick(value, other)
+
+
+def merge_states(*states: Dict) -> Dict:
+    """Merges the states written by the shards of a sync.
+
+    Bookmarks of the same key are merged by keeping the latest value, or
+    by merging them key by key for mappings. Held back bookmarks keep the
+    earliest value instead, so the unfinished records of every shard are
+    synced again. The bookmarks of in-progress
+    syncs are dropped. The open workflows of all the shards are combined.
+    """
+    bookmarks, open_workflows = {}, {}
+    for state in states:
+        for stream, stream_bookmarks in (state.get("bookmarks") or {}).items():
+            merged = bookmarks.setdefault(stream, {})
+            pick = min if stream in HELD_BACK_STREAMS else max
+            for key, value in stream_bookmarks.items():
+                if key in IN_PROGRESS_KEYS:
+                    continue
+                merged[key] = merge_values(merged[key], value, pick) if key in merged else value
+        open_workflows = merge_values(open_workflows, state.get("open_workflows") or {})
+    if open_workflows:
+        return {"bookmarks": bookmarks, "open_workflows": open_workflows}
+    return {"bookmarks": bookmarks}
+
+
+def main():
+    """Prints the merged state of the state files passed as arguments."""
+    states = []
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8") as state_file:
+            states.append(json.load(state_file))
+    json.dump(merge_states(*states), sys.stdout, indent=2)
@@ -1,11 +1,40 @@
-"""tap-circle-ci streams module."""
+"""tap-circle-ci streams module.
 
-from .jobs import Jobs
-from .pipelines import Pipelines
-from .workflows import Workflows
+Stream classes are imported on first access of `STREAMS` or of the class
+names, so importing the package does not load the stream modules.
+"""
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-STREAMS = {
-    Pipelines.tap_stream_id: Pipelines,
-    Workflows.tap_stream_id: Workflows,
-    Jobs.tap_stream_id: Jobs,
+if TYPE_CHECKING:
+    from .jobs import Jobs
+    from .pipelines import Pipelines
+    from .workflow_runs import WorkflowRuns
+    from .workflows import Workflows
+
+    STREAMS = {"pipelines": Pipelines, "workflows": Workflows, "jobs": Jobs, "workflow_runs": WorkflowRuns}
+
+STREAM_CLASSES = {
+    "pipelines": ("pipelines", "Pipelines"),
+    "workflows": ("workflows", "Workflows"),
+    "jobs": ("jobs", "Jobs"),
+    "workflow_runs": ("workflow_runs", "WorkflowRuns"),
 }
+
+__all__ = ["STREAMS", "Jobs", "Pipelines", "WorkflowRuns", "Workflows"]
+
+
+def __getattr__(name):
+    if name == "STREAMS":
+        streams = {
+            tap_stream_id: getattr(import_module(f".{module}", __name__), class_name)
+            for tap_stream_id, (module, class_name) in STREAM_CLASSES.items()
+        }
+        globals()["STREAMS"] = streams
+        return streams
+    for module, class_name in STREAM_CLASSES.values():
+        if name == class_name:
+            stream_class = getattr(import_module(f".{module}", __name__), class_name)
+            globals()[name] = stream_class
+            return stream_class
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
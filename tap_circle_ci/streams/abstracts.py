@@ -1,21 +1,124 @@
 """tap-circle-ci abstract stream module."""
 #pylint: disable=W0223
+import queue
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 from singer import (
+    SingerConfigurationError,
     Transformer,
+    clear_bookmark,
     get_bookmark,
     get_logger,
     metrics,
     write_bookmark,
-    write_record,
 )
 from singer.metadata import get_standard_metadata, to_list, to_map, write
 from singer.utils import strftime, strptime_to_utc
 
+from .. import exceptions as errors
+from ..concurrency import get_fetch_workers
+from ..queues import BoundedQueue, QueueClosed
+from ..writer import RecordWriter
+
 LOGGER = get_logger()
 
+FANOUT_ORDERS = ("oldest_first", "newest_first")
+
+# marks the end of the items handed over by a background thread
+_DONE = object()
+# marks the result of a parent whose fetch failed and is retried later on
+_DEFERRED = object()
+
+
+class Page(NamedTuple):
+    """A page of a paginated api response."""
+
+    token: Optional[str]
+    items: List[Dict]
+    next_token: Optional[str]
+
+
+class Paginator:
+    """
+    Iterates over the pages of a CircleCi listing endpoint.
+    ~~~
+    While a page is consumed, up to `read_ahead` following pages are fetched
+    by a background thread, so transforming and writing records overlaps
+    with network time. `read_ahead` defaults to the `page_read_ahead` config
+    (1 page), `0` fetches pages on demand.
+    """
+
+    def __init__(self, client, url: str, params: Optional[Dict] = None, read_ahead: Optional[int] = None) -> None:
+        self.client = client
+        self.url = url
+        self.params = dict(params or {})
+        if read_ahead is None:
+            read_ahead = int(client.config.get("page_read_ahead", 1))
+        self.read_ahead = read_ahead
+
+    def fetch_pages(self) -> Iterator[Page]:
+        """Requests the pages one after another."""
+        params = dict(self.params)
+        token = params.get("page-token")
+        while True:
+            response = self.client.get(self.url, dict(params), {})
+            items = response.get("items", [])
+            next_token = response.get("next_page_token", None)
+            if not items:
+                return
+            yield Page(token, items, next_token)
+            if next_token is None:
+                return
+            params["page-token"] = token = next_token
+
+    def pages(self) -> Iterator[Page]:
+        """Yields the pages of the listing."""
+        if self.read_ahead <= 0:
+            yield from self.fetch_pages()
+            return
+        # pylint: disable=C0415
+        from ..client import fail_fast, is_failing_fast
+
+        pages, slots, stop = queue.Queue(), threading.Semaphore(self.read_ahead - 1), threading.Event()
+        # the pages are requested with the retries allowed to the consumer, eg: none for a deferrable fetch
+        failing_fast = is_failing_fast()
+
+        def produce():
+            try:
+                with fail_fast(failing_fast):
+                    for page in self.fetch_pages():
+                        pages.put(page)
+                        # wait until the consumer picks up a page before requesting the next one
+                        while not slots.acquire(timeout=0.1):  # pylint: disable=R1732
+                            if stop.is_set():
+                                return
+                pages.put(_DONE)
+            except Exception as err:  # pylint: disable=broad-except
+                pages.put(err)
+
+        thread = threading.Thread(target=produce, name=f"paginator-{self.url}", daemon=True)
+        thread.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is _DONE:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                slots.release()
+                yield page
+        finally:
+            stop.set()
+
+    def records(self) -> Iterator[Dict]:
+        """Yields the records of all the pages."""
+        for page in self.pages():
+            yield from page.items
+
 
 class BaseStream(ABC):
     """
@@ -101,8 +204,185 @@ class BaseStream(ABC):
          - https://github.com/singer-io/getting-started/blob/master/docs/SYNC_MODE.md#replication-method
         """
 
-    def __init__(self, client=None) -> None:
+    def __init__(self, client=None, writer=None) -> None:
         self.client = client
+        self.writer = writer or RecordWriter()
+
+    def fan_out(
+        self,
+        parents: Iterable,
+        fetch: Callable[[Any], Iterable],
+        weight: Callable[[List], int] = len,
+        deferred: Optional[List] = None,
+    ) -> Iterator[Tuple[Any, Iterable]]:
+        """Yields `(parent, fetch(parent))` for every parent, in order.
+
+        With `fetch_workers` above 1, that many threads fetch the following
+        parents while the current one is consumed, the results of a parent
+        are then materialized as a list. With `auto`, `max_fetch_workers`
+        threads fetch within the adaptive request limit of the client. Fetched results wait in a queue
+        bounded by `max_buffered_records` (counted with `weight`) and
+        `max_buffered_bytes` (estimated from the record size of the writer).
+        A fetch thread counts its result in the queue as soon as it is
+        complete, waiting for room first, so fetching pauses while the
+        consumer is slow.
+
+        With a `deferred` list, parents are fetched without retries and a
+        parent failing with a transient error is appended to the list
+        instead of being yielded, so it does not hold up the others.
+        """
+        # pylint: disable=C0415,R0915
+        from ..client import DEFERRABLE_ERRORS, fail_fast
+
+        workers = get_fetch_workers(self.client.config)
+
+        def fetch_all(parent):
+            if deferred is None:
+                return list(fetch(parent))
+            try:
+                with fail_fast():
+                    return list(fetch(parent))
+            except DEFERRABLE_ERRORS as err:
+                LOGGER.warning("Deferring a %s fetch to the end of the project: %r", self.tap_stream_id, err)
+                return _DEFERRED
+
+        if workers <= 1:
+            for parent in parents:
+                result = fetch(parent) if deferred is None else fetch_all(parent)
+                if result is _DEFERRED:
+                    deferred.append(parent)
+                else:
+                    yield parent, result
+            return
+        results = BoundedQueue.from_config(self.client.config)
+
+        def fetch_counted(parent):
+            result = fetch_all(parent)
+            if result is _DEFERRED:
+                return result, 0, 0
+            records = weight(result)
+            size = records * self.writer.record_bytes
+            # the results waiting for the earlier parents count against the limits too
+            results.reserve(records, size)
+            return result, records, size
+
+        def put_result(parent, counted_result):
+            result, records, size = counted_result
+            if result is _DEFERRED:
+                deferred.append(parent)
+            else:
+                results.put((parent, result), records, size, reserved=True)
+
+        def produce():
+            pending = deque()
+            with ThreadPoolExecutor(workers, thread_name_prefix=f"{self.tap_stream_id}-fetch") as executor:
+                try:
+                    for parent in parents:
+                        pending.append((parent, executor.submit(fetch_counted, parent)))
+                        while len(pending) >= workers * 2:
+                            parent, future = pending.popleft()
+                            put_result(parent, future.result())
+                    while pending:
+                        parent, future = pending.popleft()
+                        put_result(parent, future.result())
+                    results.put(_DONE)
+                except QueueClosed:
+                    pass
+                except Exception as err:  # pylint: disable=broad-except
+                    try:
+                        results.put(err)
+                    except QueueClosed:
+                        pass
+                finally:
+                    for _, future in pending:
+                        future.cancel()
+
+        thread = threading.Thread(target=produce, name=f"{self.tap_stream_id}-fan-out", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            results.close()
+
+    def resumable_fan_out(
+        self, parents: List, fetch: Callable[[Any], Iterable], weight: Callable[[List], int] = len
+    ) -> Iterator[Tuple[Any, Iterable, Any]]:
+        """Yields `(parent, fetch(parent), checkpoint)` for every parent.
+
+        Parents failing with a transient error are deferred and fetched again,
+        with retries, once the other parents are done. `checkpoint` is the
+        parent up to which, in the order of `parents`, all the parents are
+        synced, a sync may resume from it. It is `None` while an earlier
+        parent is deferred, so bookmarks never advance past pending work.
+        """
+        deferred = []
+        for parent, result in self.fan_out(parents, fetch, weight, deferred):
+            yield parent, result, None if deferred else parent
+        if not deferred:
+            return
+        LOGGER.warning("Retrying %s deferred %s fetches", len(deferred), self.tap_stream_id)
+        for pos, (parent, result) in enumerate(self.fan_out(list(deferred), fetch, weight)):
+            yield parent, result, parent if pos < len(deferred) - 1 else parents[-1]
+
+    def schedule(self, items: List, key: Callable) -> List:
+        """Orders parent items for fan-out by their creation time, oldest or
+        newest first as set by the `fanout_order` config.
+
+        Oldest first keeps interrupted syncs resumable when new parents are
+        created in between, newest first syncs the freshest data first.
+        """
+        fanout_order = self.client.config.get("fanout_order") or FANOUT_ORDERS[0]
+        if fanout_order not in FANOUT_ORDERS:
+            raise SingerConfigurationError(f"Invalid fanout_order {fanout_order}, expected one of {FANOUT_ORDERS}")
+        return sorted(items, key=key, reverse=fanout_order == "newest_first")
+
+    def get_pages(self, url: str, params: Optional[Dict] = None, page_token: Optional[str] = None) -> Iterator[Page]:
+        """Yields the pages of a listing, starting from `page_token` if given.
+
+        A page token which can no longer be used restarts the listing from
+        its first page.
+        """
+        if page_token:
+            pages = Paginator(self.client, url, {**(params or {}), "page-token": page_token}).pages()
+            try:
+                first_page = next(pages, None)
+            except errors.Http400RequestError:
+                LOGGER.warning("Unable to resume from the saved page token, restarting the listing")
+            else:
+                if first_page is not None:
+                    yield first_page
+                    yield from pages
+                return
+        yield from Paginator(self.client, url, params).pages()
+
+    def write_state(self, state: Dict) -> None:
+        """Writes a checkpoint of the sync, then stops the sync if its budget
+        is spent."""
+        self.writer.write_state(state)
+        self.client.budget.check()
+
+    def get_page_cursor(self, state: Dict) -> Optional[Dict]:
+        """Returns the pagination cursor checkpointed by an interrupted sync
+        of the stream."""
+        return get_bookmark(state, self.tap_stream_id, "page_cursor")
+
+    def write_page_cursor(self, state: Dict, parent: str, page_token: str, high_water_mark=None, **extra) -> Dict:
+        """Checkpoints the next page token of the listing of `parent`, along
+        with the replication key high-water mark reached so far."""
+        cursor = {"parent": parent, "page_token": page_token, **extra}
+        if high_water_mark is not None:
+            cursor["high_water_mark"] = strftime(high_water_mark)
+        return write_bookmark(state, self.tap_stream_id, "page_cursor", cursor)
+
+    def clear_page_cursor(self, state: Dict) -> Dict:
+        """Removes the checkpointed pagination cursor of the stream."""
+        return clear_bookmark(state, self.tap_stream_id, "page_cursor")
 
     @classmethod
     def get_metadata(cls, schema) -> Dict[str, str]:
@@ -155,8 +435,7 @@ class IncrementalStream(BaseStream):
                     LOGGER.error("Unable to process Record, Exception occurred: %s for stream %s", _, self.__class__)
                     continue
                 if record_timestamp >= current_bookmark_date_utc:
-                    transformed_record = transformer.transform(record, schema, stream_metadata)
-                    write_record(self.tap_stream_id, transformed_record)
+                    self.writer.write_record(self.tap_stream_id, record, schema, stream_metadata, transformer)
                     counter.increment()
                     max_bookmark = max(max_bookmark, record_timestamp)
                 else:
@@ -178,8 +457,7 @@ class FullTableStream(BaseStream):
         """Abstract implementation for `type: Fulltable` stream."""
         with metrics.record_counter(self.tap_stream_id) as counter:
             for record in self.get_records():
-                transformed_record = transformer.transform(record, schema, stream_metadata)
-                write_record(self.tap_stream_id, transformed_record)
+                self.writer.write_record(self.tap_stream_id, record, schema, stream_metadata, transformer)
                 counter.increment()
         return state
 
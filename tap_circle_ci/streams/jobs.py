@@ -1,21 +1,35 @@
 """tap-circle-ci product-reviews stream module."""
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
 
 from singer import (
+    SingerConfigurationError,
     Transformer,
     clear_bookmark,
     get_bookmark,
     get_logger,
     metrics,
-    write_record,
-    write_state,
 )
+from singer.metadata import to_list, to_map, write
+from singer.utils import strptime_to_utc
 
-from .abstracts import FullTableStream
+from ..sharding import get_shard, in_shard
+from .abstracts import FullTableStream, Paginator
+from .pipelines import Pipelines
 from .workflows import Workflows
 
 LOGGER = get_logger()
 
+JOBS_SOURCES = ("workflows", "project")
+# vcs types of the project slugs, as named by the v1.1 api
+V1_VCS_TYPES = {"gh": "github", "bb": "bitbucket"}
+# statuses of the v1.1 api which are named differently by the v2 api
+V1_STATUSES = {"fixed": "success", "no_tests": "success"}
+# statuses of jobs which are not going to change anymore
+TERMINAL_STATUSES = {
+    "success", "failed", "canceled", "not_run", "infrastructure_fail", "timedout", "retried", "unauthorized",
+}
+
 
 class Jobs(FullTableStream):
     """class for jobs stream."""
@@ -24,12 +38,27 @@ class Jobs(FullTableStream):
     tap_stream_id = "jobs"
     key_properties = ["id","_workflow_id"]
     url_endpoint = "https://circleci.com/api/v2/workflow/WORKFLOW_ID/job"
+    project_url_endpoint = "https://circleci.com/api/v1.1/project/PROJECT_PATH"
+    project_page_size = 100
+    # replication key of the `project` jobs source
+    project_replication_key = "job_number"
     project = None
 
+    @classmethod
+    def get_project_metadata(cls, schema: Dict) -> List[Dict]:
+        """Returns the stream metadata of the `project` jobs source, which
+        replicates jobs incrementally by build number."""
+        stream_metadata = to_map(cls.get_metadata(schema))
+        stream_metadata = write(stream_metadata, (), "forced-replication-method", "INCREMENTAL")
+        stream_metadata = write(stream_metadata, (), "valid-replication-keys", [cls.project_replication_key])
+        stream_metadata = write(stream_metadata, ("properties", cls.project_replication_key), "inclusion", "automatic")
+        return to_list(stream_metadata)
+
     def get_workflows(self, state: Dict) -> Tuple[List, int]:
         """Returns index for sync resuming on interuption."""
         shared_workflow_ids = Workflows(self.client).prefetch_workflow_ids(self.project)
-        last_synced = get_bookmark(state, self.tap_stream_id, "currently_syncing", False)
+        cursor = self.get_page_cursor(state) or {}
+        last_synced = cursor.get("parent") or get_bookmark(state, self.tap_stream_id, "currently_syncing", False)
         last_sync_index = 0
         if last_synced:
             for pos, (workflow_id, _) in enumerate(shared_workflow_ids):
@@ -43,36 +72,165 @@ class Jobs(FullTableStream):
     def get_records(self, workflow_id: str) -> List:
         # pylint: disable=W0221
         """performs api querying and pagination of response."""
-        params = {}
         extraction_url = self.url_endpoint.replace("WORKFLOW_ID", workflow_id)
-        while True:
-            response = self.client.get(extraction_url, params, {})
-            raw_records = response.get("items", [])
-            next_page_token = response.get("next_page_token", None)
-            if not raw_records:
-                break
-            if next_page_token is None:
-                break
-            params["page-token"] = next_page_token
-
-        return raw_records
+        return list(Paginator(self.client, extraction_url).records())
 
     def sync(self, state: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer) -> Dict:
         """Sync implementation for `jobs` stream."""
         # pylint: disable=R0914
+        jobs_source = self.client.config.get("jobs_source") or JOBS_SOURCES[0]
+        if jobs_source not in JOBS_SOURCES:
+            raise SingerConfigurationError(f"Invalid jobs_source {jobs_source}, expected one of {JOBS_SOURCES}")
+        if jobs_source == "project":
+            return self.sync_project_jobs(state, schema, stream_metadata, transformer)
         with metrics.Timer(self.tap_stream_id, None):
             pipelines, start_index = self.get_workflows(state)
+            cursor = self.get_page_cursor(state) or {}
             LOGGER.info("STARTING SYNC FROM INDEX %s", start_index)
             prod_len = len(pipelines)
 
+            def fetch(parent):
+                workflow_id, _ = parent
+                page_token = cursor.get("page_token") if cursor.get("parent") == workflow_id else None
+                return self.get_pages(self.url_endpoint.replace("WORKFLOW_ID", workflow_id), page_token=page_token)
+
             with metrics.Counter(self.tap_stream_id) as counter:
-                for index, (workflow_id, pipeline_id) in enumerate(pipelines[start_index:], max(start_index, 1)):
+                for index, ((workflow_id, pipeline_id), pages, checkpoint) in enumerate(
+                    self.resumable_fan_out(
+                        pipelines[start_index:], fetch, weight=lambda pages: sum(len(page.items) for page in pages)
+                    ),
+                    max(start_index, 1),
+                ):
                     LOGGER.info("Syncing jobs for workflow *****%s (%s/%s)", workflow_id[-4:], index, prod_len)
-                    for rec in self.get_records(workflow_id):
-                        rec["_workflow_id"], rec["_pipeline_id"] = workflow_id, pipeline_id
-                        write_record(self.tap_stream_id, transformer.transform(rec, schema, stream_metadata))
-                        counter.increment()
-                    state = self.write_bookmark(state, "currently_syncing", workflow_id)
-                    write_state(state)
+                    for page in pages:
+                        for rec in page.items:
+                            rec["_workflow_id"], rec["_pipeline_id"] = workflow_id, pipeline_id
+                            self.writer.write_record(self.tap_stream_id, rec, schema, stream_metadata, transformer)
+                            counter.increment()
+                        if page.next_token is not None and checkpoint is not None:
+                            state = self.write_page_cursor(state, workflow_id, page.next_token)
+                            self.write_state(state)
+                    state = self.clear_page_cursor(state)
+                    if checkpoint is not None:
+                        state = self.write_bookmark(state, "currently_syncing", checkpoint[0])
+                    self.write_state(state)
             state = clear_bookmark(state, self.tap_stream_id, "currently_syncing")
         return state
+
+    def get_project_pages(self, branch: Optional[str] = None, offset: int = 0) -> Iterator[Tuple[int, List[Dict]]]:
+        """Yields the pages of builds of the project, or of one of its
+        branches, newest first from the v1.1 recent builds listing, along
+        with the offset of the next page."""
+        vcs_type, project_path = self.project.split("/", 1)
+        url = self.project_url_endpoint.replace("PROJECT_PATH", f"{V1_VCS_TYPES.get(vcs_type, vcs_type)}/{project_path}")
+        if branch is not None:
+            url += "/tree/" + quote(branch, safe="")
+        while True:
+            builds = self.client.get(url, {"limit": self.project_page_size, "offset": offset}, {})
+            if not isinstance(builds, list) or not builds:
+                return
+            offset += len(builds)
+            yield offset, builds
+            if len(builds) < self.project_page_size:
+                return
+
+    def get_pipeline_ids(self, shard: Optional[Tuple[int, int]]) -> Dict[str, Optional[str]]:
+        """Returns the pipeline of the workflows of the project, as
+        `{workflow_id: pipeline_id}`.
+
+        Pipelines are taken from the workflows synced in the same run. A
+        sharded sync lists the workflows of its pipelines in bulk otherwise,
+        since the pipeline decides the shard of a job. Pipelines of unknown
+        workflows are left empty instead of being requested one by one.
+        """
+        pipeline_ids = dict((self.client.shared_workflow_ids or {}).get(self.project, []))
+        if shard is not None and not pipeline_ids:
+            pipeline_ids.update(Workflows(self.client).prefetch_workflow_ids(self.project))
+        elif not pipeline_ids:
+            LOGGER.warning(
+                "The workflows of project %s were not synced, the _pipeline_id of its jobs is left empty", self.project
+            )
+        return pipeline_ids
+
+    def to_job_record(self, build: Dict, pipeline_id: Optional[str]) -> Dict:
+        """Maps a v1.1 build to a record of the v2 jobs schema."""
+        workflow = build["workflows"]
+        return {
+            "id": workflow.get("job_id"),
+            "job_number": build.get("build_num"),
+            "name": workflow.get("job_name") or build.get("job_name"),
+            "status": V1_STATUSES.get(build.get("status"), build.get("status")),
+            "started_at": build.get("start_time"),
+            "stopped_at": build.get("stop_time"),
+            "dependencies": workflow.get("upstream_job_ids") or [],
+            "project_slug": self.project,
+            "type": "build",
+            "_workflow_id": workflow.get("workflow_id"),
+            "_pipeline_id": pipeline_id,
+        }
+
+    def sync_project_jobs(self, state: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer) -> Dict:
+        """Syncs the jobs of the project from the project wide listing of
+        builds, instead of one listing per workflow.
+
+        Builds of the branches set in `project_branches` are listed newest
+        first down to the build number bookmarked for the project, or to the
+        `start_date`. The offset of the next page is checkpointed after every
+        page, along with the highest build number listed. The bookmark stays
+        below the oldest unfinished job, so it is listed again until it
+        finishes. The stream is replicated incrementally by `job_number` with
+        this source, see `get_project_metadata`.
+        """
+        # pylint: disable=R0914
+        with metrics.Timer(self.tap_stream_id, None):
+            last_build = get_bookmark(state, self.tap_stream_id, self.project, 0)
+            start_date = strptime_to_utc(self.client.config["start_date"])
+            shard = get_shard(self.client.config)
+            pipeline_ids = self.get_pipeline_ids(shard)
+            cursor = self.get_page_cursor(state) or {}
+            if cursor.get("parent") != self.project:
+                cursor = {}
+            max_build, oldest_open = cursor.get("max_build", last_build), cursor.get("oldest_open")
+            branches = Pipelines(self.client).get_branches(self.project)
+            if cursor and cursor.get("branch") in branches:
+                branches = branches[branches.index(cursor["branch"]):]
+            with metrics.Counter(self.tap_stream_id) as counter:
+                for branch in branches:
+                    offset = cursor["page_token"] if cursor and cursor.get("branch") == branch else 0
+                    for offset, builds in self.get_project_pages(branch, offset):
+                        done = False
+                        for build in builds:
+                            queued_at = build.get("queued_at") or build.get("start_time")
+                            queued_at = strptime_to_utc(queued_at) if queued_at else None
+                            if build["build_num"] <= last_build or queued_at and queued_at < start_date:
+                                done = True
+                                break
+                            max_build = max(max_build, build["build_num"])
+                            if not build.get("workflows"):
+                                # builds of projects not using workflows have no v2 job
+                                continue
+                            pipeline_id = pipeline_ids.get(build["workflows"]["workflow_id"])
+                            if shard is not None and pipeline_id is None:
+                                if not queued_at or queued_at >= self.client.cycle_started_at:
+                                    # the workflow may be newer than the listing, its job is listed again next time
+                                    oldest_open = min(oldest_open or build["build_num"], build["build_num"])
+                                continue
+                            if shard is not None and not in_shard(pipeline_id, shard):
+                                continue
+                            record = self.to_job_record(build, pipeline_id)
+                            if record["status"] not in TERMINAL_STATUSES:
+                                oldest_open = min(oldest_open or build["build_num"], build["build_num"])
+                            self.writer.write_record(self.tap_stream_id, record, schema, stream_metadata, transformer)
+                            counter.increment()
+                        if done:
+                            break
+                        state = self.write_page_cursor(
+                            state, self.project, offset, branch=branch, max_build=max_build, oldest_open=oldest_open
+                        )
+                        self.write_state(state)
+            if oldest_open is not None:
+                max_build = min(max_build, oldest_open - 1)
+            state = self.clear_page_cursor(state)
+            state = self.write_bookmark(state, self.project, max_build)
+            self.write_state(state)
+        return state
@@ -1,10 +1,13 @@
 """tap-circle-ci unsubsrcibers stream module."""
-from typing import Dict, Iterator, List
+import json
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from singer import Transformer, get_logger, metrics, write_record
+from singer import Transformer, get_logger, metrics
 from singer.utils import strftime, strptime_to_utc
 
-from .abstracts import IncrementalStream
+from ..sharding import get_shard, in_shard
+from .abstracts import IncrementalStream, Page
 
 LOGGER = get_logger()
 
@@ -21,53 +24,139 @@ class Pipelines(IncrementalStream):
     valid_replication_keys = ["updated_at"]
     project = None
 
+    org_url_endpoint = "https://circleci.com/api/v2/pipeline"
+
     def get_url_endpoint(self) -> str:
         """Returns a formatted endpoint using the stream attributes."""
         return self.url_endpoint.replace("PROJECT_PATH", self.project)
 
+    def get_branches(self, project: Optional[str] = None) -> List[Optional[str]]:
+        """Returns the branch filters configured for a project, defaults to
+        the current project.
+
+        `project_branches` maps a project slug to its branch names, either as a
+        list or a space separated string. `[None]` means the project is not filtered.
+        """
+        project_branches = self.client.config.get("project_branches") or {}
+        if isinstance(project_branches, str):
+            project_branches = json.loads(project_branches)
+        branches = project_branches.get(project or self.project) or []
+        if isinstance(branches, str):
+            branches = branches.split(" ")
+        return list(filter(None, branches)) or [None]
+
+    def paginate(self, extraction_url: str, params: Dict) -> Iterator[Dict]:
+        """performs api querying and pagination of response."""
+        with metrics.Counter("page_count") as page_counter:
+            for page in self.get_pages(extraction_url, params):
+                page_counter.increment()
+                yield from page.items
+
     def get_records(self) -> Iterator[Dict]:
+        for _, page in self.get_branch_pages():
+            yield from page.items
+
+    def get_branch_pages(self, cursor: Optional[Dict] = None) -> Iterator[Tuple[Optional[str], Page]]:
+        """Yields the pages of pipelines of the current project along with
+        their branch, resuming from a checkpointed `cursor` if given.
+
+        Pipelines of other shards are filtered out of the pages.
+        """
+        shard = get_shard(self.client.config)
         extraction_url = self.get_url_endpoint()
-        params = {}
+        branches = self.get_branches()
+        if cursor and cursor.get("branch") in branches:
+            branches = branches[branches.index(cursor["branch"]):]
         with metrics.Counter("page_count") as page_counter:
-            while True:
-                response = self.client.get(extraction_url, params, {})
-                page_counter.increment()
-                next_page_token = response["next_page_token"]
-                raw_records = response.get("items", [])
-                if not raw_records:
-                    break
-                params["page-token"] = next_page_token
-                yield from raw_records
-                if next_page_token is None:
-                    break
+            for branch in branches:
+                params = {}
+                if branch is not None:
+                    LOGGER.info("Fetching pipelines of project %s for branch %s", self.project, branch)
+                    params["branch"] = branch
+                page_token = cursor["page_token"] if cursor and cursor.get("branch") == branch else None
+                for page in self.get_pages(extraction_url, params, page_token):
+                    page_counter.increment()
+                    yield branch, page._replace(items=[rec for rec in page.items if in_shard(rec["id"], shard)])
+
+    def prefetch_org_pipelines(self) -> Dict[str, List[str]]:
+        """Crawls the org wide pipeline listing once and routes the pipeline
+        ids to their projects by `project_slug`.
+
+        Only the ids in fan-out order and their `updated_at` are kept, the
+        records themselves are emitted by the crawl of each project's
+        endpoint. The ids are shared through `shared_pipeline_ids`, so the
+        child streams of a project don't crawl its pipelines.
+        """
+        if self.client.shared_org_pipelines is not None:
+            return self.client.shared_org_pipelines
+        org_slug = self.client.config["org_slug"]
+        shard = get_shard(self.client.config)
+        LOGGER.info("Fetching all pipeline ids for org %s", org_slug)
+        org_pipelines = {}
+        for record in self.paginate(self.org_url_endpoint, {"org-slug": org_slug}):
+            project = record.get("project_slug")
+            branches = self.get_branches(project)
+            if branches != [None] and (record.get("vcs") or {}).get("branch") not in branches:
+                continue
+            # projects are listed even when all their pipelines belong to other shards
+            project_pipelines = org_pipelines.setdefault(project, [])
+            if in_shard(record["id"], shard):
+                project_pipelines.append((record.get("created_at") or "", record["id"]))
+                self.client.shared_pipeline_updated_at[record["id"]] = record.get("updated_at")
+        org_pipelines = {project: self.schedule_pipeline_ids(ids) for project, ids in org_pipelines.items()}
+        if self.client.shared_pipeline_ids is None:
+            self.client.shared_pipeline_ids = {}
+        for project, pipeline_ids in org_pipelines.items():
+            self.client.shared_pipeline_ids.setdefault(project, pipeline_ids)
+        self.client.shared_org_pipelines = org_pipelines
+        return org_pipelines
 
     def sync(self, state: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer) -> Dict:
         """Implementation for `type: Incremental` stream."""
         current_bookmark_date = self.get_bookmark(state, f"{self.project}")
         pipeline_ids = []
         max_bookmark = current_bookmark_date_utc = strptime_to_utc(current_bookmark_date)
+        cursor = self.get_page_cursor(state)
+        if cursor and cursor["parent"] == self.project:
+            LOGGER.warning("Last Sync was interrupted, resuming pipelines of project %s from the saved page", self.project)
+            max_bookmark = max(max_bookmark, strptime_to_utc(cursor["high_water_mark"]))
+        else:
+            cursor = None
 
         with metrics.record_counter(self.tap_stream_id) as counter:
-            for record in self.get_records():
-                pipeline_ids.append(record["id"])
-                try:
-                    record_timestamp = strptime_to_utc(record[self.replication_key])
-                except IndexError as err:
-                    LOGGER.error("Unable to process Record, Exception occurred: %s for stream %s", err, self.__class__)
-                    raise err
-                if record_timestamp >= current_bookmark_date_utc:
-                    transformed_record = transformer.transform(record, schema, stream_metadata)
-                    write_record(self.tap_stream_id, transformed_record)
-                    counter.increment()
-                    max_bookmark = max(max_bookmark, record_timestamp)
-            if self.client.shared_pipeline_ids is None:
-                self.client.shared_pipeline_ids = {}
-            self.client.shared_pipeline_ids.update({self.project: pipeline_ids})
+            for branch, page in self.get_branch_pages(cursor):
+                for record in page.items:
+                    pipeline_ids.append((record.get("created_at") or "", record["id"]))
+                    self.client.shared_pipeline_updated_at[record["id"]] = record.get("updated_at")
+                    try:
+                        record_timestamp = strptime_to_utc(record[self.replication_key])
+                    except IndexError as err:
+                        LOGGER.error(
+                            "Unable to process Record, Exception occurred: %s for stream %s", err, self.__class__
+                        )
+                        raise err
+                    if record_timestamp >= current_bookmark_date_utc:
+                        self.writer.write_record(self.tap_stream_id, record, schema, stream_metadata, transformer)
+                        counter.increment()
+                        max_bookmark = max(max_bookmark, record_timestamp)
+                if page.next_token is not None:
+                    state = self.write_page_cursor(state, self.project, page.next_token, max_bookmark, branch=branch)
+                    self.write_state(state)
+            # a resumed crawl misses the pipelines of the earlier pages, child streams fetch the complete list
+            if cursor is None:
+                if self.client.shared_pipeline_ids is None:
+                    self.client.shared_pipeline_ids = {}
+                self.client.shared_pipeline_ids.update({self.project: self.schedule_pipeline_ids(pipeline_ids)})
+            state = self.clear_page_cursor(state)
             state = self.write_bookmark(
                 state, key=f"{self.project}", value=strftime(max_bookmark)
             )
         return state
 
+    def schedule_pipeline_ids(self, pipelines: List[Tuple[str, str]]) -> List[str]:
+        """Returns the ids of `(created_at, id)` pairs in fan-out order."""
+        return [pipeline_id for _, pipeline_id in self.schedule(pipelines, key=itemgetter(0))]
+
     def prefetch_pipeline_ids(self, project) -> List:
         """Helper method implemented for other streams to load all parent
         pipeline_ids.
@@ -85,10 +174,11 @@ class Pipelines(IncrementalStream):
             LOGGER.info("Fetching all pipeline records")
             for record in self.get_records():
                 try:
-                    project_pipeline_ids.append(record["id"])
+                    project_pipeline_ids.append((record.get("created_at") or "", record["id"]))
+                    self.client.shared_pipeline_updated_at[record["id"]] = record.get("updated_at")
                 except KeyError:
                     LOGGER.warning("Unable to find Pipeline ID")
-            project_pipeline_ids.sort()
+            project_pipeline_ids = self.schedule_pipeline_ids(project_pipeline_ids)
             pipeline_ids.update({project: project_pipeline_ids})
             self.client.shared_pipeline_ids = pipeline_ids
         return project_pipeline_ids
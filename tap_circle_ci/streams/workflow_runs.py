@@ -0,0 +1,85 @@
+"""tap-circle-ci workflow runs stream module."""
+from datetime import timedelta
+from typing import Dict, List
+from urllib.parse import quote
+
+from singer import Transformer, get_logger, metrics
+from singer.utils import now, strftime, strptime_to_utc
+
+from ..sharding import get_shard
+from .abstracts import IncrementalStream, Paginator
+
+LOGGER = get_logger()
+
+# the insights api only returns the runs of the last 90 days
+INSIGHTS_RETENTION_DAYS = 90
+# default of the `workflow_runs_lookback_days` config
+DEFAULT_LOOKBACK_DAYS = 1
+
+
+class WorkflowRuns(IncrementalStream):
+    """class for `workflow_runs` stream.
+
+    Runs are listed per workflow name for a whole project by the Insights
+    API, instead of per pipeline. The API only lists runs once they
+    completed, so they are bookmarked by `stopped_at` and listed from
+    `workflow_runs_lookback_days` before the bookmark, for the runs created
+    earlier but completed since.
+    """
+
+    stream = "workflow_runs"
+    tap_stream_id = "workflow_runs"
+    key_properties = ["id"]
+    replication_key = "stopped_at"
+    valid_replication_keys = ["stopped_at"]
+    config_start_key = "start_date"
+    url_endpoint = "https://circleci.com/api/v2/insights/PROJECT_PATH/workflows/WORKFLOW_NAME"
+    names_url_endpoint = "https://circleci.com/api/v2/insights/PROJECT_PATH/workflows"
+    project = None
+
+    def get_workflow_names(self) -> List[str]:
+        """Returns the names of the workflows run in the project."""
+        url = self.names_url_endpoint.replace("PROJECT_PATH", self.project)
+        return sorted({item["name"] for item in Paginator(self.client, url, {"all-branches": "true"}).records()})
+
+    def get_start_date(self, state: Dict):
+        """Returns the date from which runs are listed, the lookback window
+        before the bookmark within the retention of the insights api."""
+        bookmark_date = strptime_to_utc(self.get_bookmark(state, self.project))
+        lookback = timedelta(days=float(self.client.config.get("workflow_runs_lookback_days", DEFAULT_LOOKBACK_DAYS)))
+        return max(bookmark_date - lookback, now() - timedelta(days=INSIGHTS_RETENTION_DAYS - 1))
+
+    def get_records(self, name: str, params: Dict):
+        # pylint: disable=W0221
+        """performs api querying and pagination of response."""
+        url = self.url_endpoint.replace("PROJECT_PATH", self.project).replace("WORKFLOW_NAME", quote(name, safe=""))
+        return Paginator(self.client, url, params).records()
+
+    def sync(self, state: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer) -> Dict:
+        """Sync implementation for `workflow_runs` stream."""
+        shard = get_shard(self.client.config)
+        if shard is not None and shard[0] != 0:
+            # runs are not listed per pipeline, the first shard syncs all of them
+            return state
+        with metrics.Timer(self.tap_stream_id, None):
+            start_date = self.get_start_date(state)
+            # runs of the lookback window which stopped before the bookmark were emitted by an earlier sync
+            bookmark = max_bookmark = max(strptime_to_utc(self.get_bookmark(state, self.project)), start_date)
+            params = {"all-branches": "true", "start-date": start_date.strftime("%Y-%m-%dT%H:%M:%SZ")}
+            names = self.get_workflow_names()
+            LOGGER.info("Syncing runs of %s workflows for project %s", len(names), self.project)
+            with metrics.Counter(self.tap_stream_id) as counter:
+                for name, records in self.fan_out(names, lambda name: self.get_records(name, params)):
+                    for record in records:
+                        if not record.get(self.replication_key):
+                            continue
+                        record_timestamp = strptime_to_utc(record[self.replication_key])
+                        if record_timestamp < bookmark:
+                            continue
+                        record["name"], record["project_slug"] = name, self.project
+                        self.writer.write_record(self.tap_stream_id, record, schema, stream_metadata, transformer)
+                        counter.increment()
+                        max_bookmark = max(max_bookmark, record_timestamp)
+            state = self.write_bookmark(state, self.project, strftime(max_bookmark))
+            self.write_state(state)
+        return state
@@ -1,6 +1,6 @@
 """tap-circle-ci product-reviews stream module."""
-from datetime import datetime
-from typing import Dict, List, Tuple
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from singer import (
     Transformer,
@@ -8,16 +8,18 @@ from singer import (
     get_bookmark,
     get_logger,
     metrics,
-    write_record,
-    write_state,
 )
-from singer.utils import strftime, strptime_to_utc
+from singer.utils import now, strftime, strptime_to_utc
 
-from .abstracts import IncrementalStream
+from ..sharding import get_shard, in_shard
+from .abstracts import IncrementalStream, Page
 from .pipelines import Pipelines
 
 LOGGER = get_logger()
 
+# statuses of workflows which are not going to change anymore
+TERMINAL_STATUSES = {"success", "failed", "error", "canceled", "not_run", "unauthorized"}
+
 
 class Workflows(IncrementalStream):
     """class for workflow stream."""
@@ -29,12 +31,14 @@ class Workflows(IncrementalStream):
     valid_replication_keys = ["created_at"]
     config_start_key = "start_date"
     url_endpoint = "https://circleci.com/api/v2/pipeline/PIPELINE_ID/workflow"
+    workflow_url_endpoint = "https://circleci.com/api/v2/workflow/WORKFLOW_ID"
     project = None
 
     def get_pipelines(self, state: Dict) -> Tuple[List, int]:
         """Returns index for sync resuming on interuption."""
         shared_pipeline_ids = Pipelines(self.client).prefetch_pipeline_ids(self.project)
-        last_synced = get_bookmark(state, self.tap_stream_id, "currently_syncing", False)
+        cursor = self.get_page_cursor(state) or {}
+        last_synced = cursor.get("parent") or get_bookmark(state, self.tap_stream_id, "currently_syncing", False)
         last_sync_index = 0
         if last_synced:
             for pos, prod_id in enumerate(shared_pipeline_ids):
@@ -44,61 +48,214 @@ class Workflows(IncrementalStream):
                     break
         return shared_pipeline_ids, last_sync_index
 
-    def get_records(self, pipeline_id: str, bookmark_date: str) -> Tuple[List, datetime]:
-        # pylint: disable=W0221
-        """performs api querying and pagination of response."""
-        params = {}
-        extraction_url = self.url_endpoint.replace("PIPELINE_ID", pipeline_id)
+    def is_pipeline_unchanged(self, pipeline_id: str, bookmark_date: str) -> bool:
+        """Checks if a pipeline was last updated before the workflows
+        bookmark, such a pipeline can not have new workflows."""
+        updated_at = self.client.shared_pipeline_updated_at.get(pipeline_id)
+        if not updated_at or not bookmark_date:
+            return False
+        return strptime_to_utc(updated_at) < strptime_to_utc(bookmark_date)
+
+    def get_known_workflow_ids(self, pipeline_id: str) -> Optional[List[Tuple[str, str]]]:
+        """Returns the `(workflow_id, pipeline_id)` pairs of a pipeline listed
+        by an earlier sync of a watch, unless it was updated since."""
+        updated_at, workflow_ids = self.client.known_workflow_ids.get(pipeline_id, (None, None))
+        if updated_at is None or updated_at != self.client.shared_pipeline_updated_at.get(pipeline_id):
+            return None
+        return workflow_ids
+
+    def remember_workflow_ids(self, pipeline_id: str, workflow_ids: List[Tuple[str, str]]) -> None:
+        """Keeps the complete workflow listing of a pipeline for the next
+        syncs of a watch."""
+        updated_at = self.client.shared_pipeline_updated_at.get(pipeline_id)
+        self.client.known_workflow_ids[pipeline_id] = (updated_at, workflow_ids)
+
+    def get_open_workflows(self, state: Dict) -> Dict[str, List[str]]:
+        """Returns the workflows of the project which were not finished when
+        last synced, as `{workflow_id: [pipeline_id, created_at]}`."""
+        return dict((state.get("open_workflows") or {}).get(self.project) or {})
+
+    def write_open_workflows(self, state: Dict, open_workflows: Dict[str, List[str]]) -> Dict:
+        """Checkpoints the unfinished workflows of the project.
+
+        They are kept under the `open_workflows` key of the state, next to
+        the bookmarks which only hold replication key values.
+        """
+        all_open_workflows = dict(state.get("open_workflows") or {})
+        if open_workflows:
+            all_open_workflows[self.project] = open_workflows
+        else:
+            all_open_workflows.pop(self.project, None)
+        if all_open_workflows:
+            state["open_workflows"] = all_open_workflows
+        else:
+            state.pop("open_workflows", None)
+        return state
+
+    @staticmethod
+    def track_status(open_workflows: Dict[str, List[str]], record: Dict) -> None:
+        """Adds an unfinished workflow to the open workflows, or removes a
+        finished one."""
+        if record.get("status") in TERMINAL_STATUSES:
+            open_workflows.pop(record["id"], None)
+        else:
+            open_workflows[record["id"]] = [record.get("pipeline_id"), record.get("created_at")]
+
+    def refresh_open_workflows(
+        self, open_workflows: Dict[str, List[str]], synced_ids: set, schema: Dict, stream_metadata: Dict,
+        transformer: Transformer, counter
+    ) -> None:
+        """Emits again the unfinished workflows of the previous syncs which
+        were not synced this time, with their current status.
+
+        Workflows open for more than `open_workflow_max_age_days` (30 days by
+        default) are given up on.
+        """
+        # pylint: disable=R0913,R0917
+        shard = get_shard(self.client.config)
+        max_age = int(self.client.config.get("open_workflow_max_age_days", 30))
+        oldest = now() - timedelta(days=max_age)
+        workflow_ids = []
+        for workflow_id, (pipeline_id, created_at) in list(open_workflows.items()):
+            if created_at and strptime_to_utc(created_at) < oldest:
+                open_workflows.pop(workflow_id)
+            elif workflow_id not in synced_ids and in_shard(pipeline_id or workflow_id, shard):
+                workflow_ids.append(workflow_id)
+        if not workflow_ids:
+            return
+        LOGGER.info("Refreshing %s unfinished workflows", len(workflow_ids))
+
+        def fetch(workflow_id):
+            return [self.client.get(self.workflow_url_endpoint.replace("WORKFLOW_ID", workflow_id), {}, {})]
+
+        for workflow_id, (record,) in self.fan_out(workflow_ids, fetch):
+            if "id" not in record:
+                # the workflow is gone
+                open_workflows.pop(workflow_id, None)
+                continue
+            self.writer.write_record(self.tap_stream_id, record, schema, stream_metadata, transformer)
+            self.track_status(open_workflows, record)
+            counter.increment()
+
+    def get_start_date(self, bookmark_date: Optional[str]) -> datetime:
+        """Returns the date from which workflows of a pipeline are synced."""
         config_start = self.client.config.get(self.config_start_key, False)
         bookmark_date = bookmark_date or config_start
-        bookmark_date = current_max = max(strptime_to_utc(bookmark_date), strptime_to_utc(config_start))
-        filtered_records, parent_record_ids = [], []
-        while True:
-            response = self.client.get(extraction_url, params, {})
-            raw_records = response.get("items", [])
-            next_page_token = response.get("next_page_token", None)
-            if not raw_records:
-                break
-            for record in raw_records:
+        return max(strptime_to_utc(bookmark_date), strptime_to_utc(config_start))
+
+    def get_record_pages(
+        self, pipeline_id: str, bookmark_date: Optional[str], page_token: Optional[str] = None
+    ) -> Iterator[Tuple[Page, List, List, datetime]]:
+        """performs api querying and pagination of response.
+
+        Yields for every page the `(workflow_id, pipeline_id)` pairs, the
+        records created after the bookmark and their max replication key.
+        """
+        extraction_url = self.url_endpoint.replace("PIPELINE_ID", pipeline_id)
+        bookmark_date = self.get_start_date(bookmark_date)
+        for page in self.get_pages(extraction_url, page_token=page_token):
+            current_max, filtered_records, parent_record_ids = bookmark_date, [], []
+            for record in page.items:
                 parent_record_ids.append((record["id"], pipeline_id))
                 record_timestamp = strptime_to_utc(record[self.replication_key])
                 if record_timestamp >= bookmark_date:
                     current_max = max(current_max, record_timestamp)
                     filtered_records.append(record)
-            if next_page_token is None:
-                break
-            params["page-token"] = next_page_token
+            yield page, parent_record_ids, filtered_records, current_max
+
+    def get_records(self, pipeline_id: str, bookmark_date: str) -> Tuple[List, List, datetime]:
+        # pylint: disable=W0221
+        """performs api querying and pagination of response."""
+        current_max = self.get_start_date(bookmark_date)
+        filtered_records, parent_record_ids = [], []
+        for _, page_parent_ids, page_records, page_max in self.get_record_pages(pipeline_id, bookmark_date):
+            parent_record_ids += page_parent_ids
+            filtered_records += page_records
+            current_max = max(current_max, page_max)
         return (parent_record_ids, filtered_records, current_max)
 
     def sync(self, state: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer) -> Dict:
         """Sync implementation for `product_reviews` stream."""
-        # pylint: disable=R0914
+        # pylint: disable=R0914,R0915
         with metrics.Timer(self.tap_stream_id, None):
             pipelines, start_index = self.get_pipelines(state)
+            cursor = self.get_page_cursor(state) or {}
             LOGGER.info("STARTING SYNC FROM INDEX %s", start_index)
             prod_len = len(pipelines)
             pipeline_wflo_ids = []
+            open_workflows, synced_ids = self.get_open_workflows(state), set()
+            unlisted_pipeline_ids, skipped_count = list(pipelines[:start_index]), 0
+            parents = []
+            for index, pipeline_id in enumerate(pipelines[start_index:], max(start_index, 1)):
+                bookmark_date, page_token = self.get_bookmark(state, pipeline_id), None
+                if cursor.get("parent") == pipeline_id:
+                    LOGGER.warning("Resuming workflows of pipeline *****%s from the saved page", pipeline_id[-4:])
+                    page_token = cursor["page_token"]
+                    # the workflows of the pages synced before the interruption are listed again for jobs
+                    unlisted_pipeline_ids.append(pipeline_id)
+                elif self.is_pipeline_unchanged(pipeline_id, bookmark_date):
+                    known_workflow_ids = self.get_known_workflow_ids(pipeline_id)
+                    if known_workflow_ids is None:
+                        unlisted_pipeline_ids.append(pipeline_id)
+                    else:
+                        pipeline_wflo_ids += known_workflow_ids
+                    skipped_count += 1
+                    continue
+                parents.append((index, pipeline_id, bookmark_date, page_token))
+
+            def fetch(parent):
+                _, pipeline_id, bookmark_date, page_token = parent
+                return self.get_record_pages(pipeline_id, bookmark_date, page_token)
+
             with metrics.Counter(self.tap_stream_id) as counter:
-                for index, pipeline_id in enumerate(pipelines[start_index:], max(start_index, 1)):
+                for (index, pipeline_id, bookmark_date, page_token), pages, checkpoint in self.resumable_fan_out(
+                    parents, fetch, weight=lambda pages: sum(len(page.items) for page, *_ in pages)
+                ):
                     LOGGER.info("Syncing workflows for pipeline *****%s (%s/%s)", pipeline_id[-4:], index, prod_len)
-                    bookmark_date = self.get_bookmark(state, pipeline_id)
-                    parent_record_ids, records, max_bookmark = self.get_records(pipeline_id, bookmark_date)
-                    pipeline_wflo_ids += parent_record_ids
-                    for rec in records:
-                        write_record(self.tap_stream_id, transformer.transform(rec, schema, stream_metadata))
-                        counter.increment()
-
-                    LOGGER.info("Total records synced : %s", len(records))
+                    max_bookmark, record_count, workflow_ids = self.get_start_date(bookmark_date), 0, []
+                    if page_token is not None:
+                        max_bookmark = max(max_bookmark, strptime_to_utc(cursor["high_water_mark"]))
+                    for page, parent_record_ids, records, page_max in pages:
+                        workflow_ids += parent_record_ids
+                        for rec in records:
+                            self.writer.write_record(self.tap_stream_id, rec, schema, stream_metadata, transformer)
+                            self.track_status(open_workflows, rec)
+                            synced_ids.add(rec["id"])
+                            counter.increment()
+                        record_count += len(records)
+                        max_bookmark = max(max_bookmark, page_max)
+                        if page.next_token is not None and checkpoint is not None:
+                            state = self.write_page_cursor(state, pipeline_id, page.next_token, max_bookmark)
+                            self.write_state(state)
+
+                    if page_token is None:
+                        pipeline_wflo_ids += workflow_ids
+                        self.remember_workflow_ids(pipeline_id, workflow_ids)
+                    LOGGER.info("Total records synced : %s", record_count)
+                    state = self.clear_page_cursor(state)
                     state = self.write_bookmark(state, pipeline_id, strftime(max_bookmark))
-                    state = self.write_bookmark(state, "currently_syncing", pipeline_id)
-                    write_state(state)
+                    state = self.write_open_workflows(state, open_workflows)
+                    if checkpoint is not None:
+                        state = self.write_bookmark(state, "currently_syncing", checkpoint[1])
+                    self.write_state(state)
+                self.refresh_open_workflows(open_workflows, synced_ids, schema, stream_metadata, transformer, counter)
+                state = self.write_open_workflows(state, open_workflows)
+                self.write_state(state)
                 if self.client.shared_workflow_ids is None:
                     self.client.shared_workflow_ids = {}
-            pipeline_wflo_ids.sort(key=lambda x: x[1])
-            self.client.shared_workflow_ids.update({self.project: pipeline_wflo_ids})
+            LOGGER.info("Skipped %s pipelines not updated since the last sync", skipped_count)
+            self.client.shared_workflow_ids.update({self.project: self.schedule_workflow_ids(pipeline_wflo_ids)})
+            self.client.unlisted_pipeline_ids.update({self.project: unlisted_pipeline_ids})
             state = clear_bookmark(state, self.tap_stream_id, "currently_syncing")
         return state
 
+    def schedule_workflow_ids(self, pipeline_wflo_ids: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Orders `(workflow_id, pipeline_id)` pairs in the fan-out order of
+        their pipelines."""
+        pipeline_ids = Pipelines(self.client).prefetch_pipeline_ids(self.project)
+        positions = {pipeline_id: pos for pos, pipeline_id in enumerate(pipeline_ids)}
+        return sorted(pipeline_wflo_ids, key=lambda x: positions.get(x[1], len(positions)))
+
     def prefetch_workflow_ids(self, project) -> List:
         """Helper method implemented for other streams to load all parent
         workflow_ids.
@@ -110,17 +267,34 @@ class Workflows(IncrementalStream):
         pipeline_wflo_ids = []
         self.project = project
         if workflow_ids and self.project in workflow_ids:
-            return workflow_ids[self.project]
+            # the workflows sync skips pipelines without new workflows, only those are fetched here
+            project_pipeline_ids = self.client.unlisted_pipeline_ids.pop(self.project, [])
+            pipeline_wflo_ids = list(workflow_ids[self.project])
+        else:
+            project_pipeline_ids = Pipelines(self.client).prefetch_pipeline_ids(self.project)
+        if not project_pipeline_ids:
+            return pipeline_wflo_ids
+        # pipelines listed by an earlier sync of a watch, and not updated since, are not fetched again
+        unknown_pipeline_ids = []
+        for pipeline_id in project_pipeline_ids:
+            known_workflow_ids = self.get_known_workflow_ids(pipeline_id)
+            if known_workflow_ids is None:
+                unknown_pipeline_ids.append(pipeline_id)
+            else:
+                pipeline_wflo_ids += known_workflow_ids
+        project_pipeline_ids = unknown_pipeline_ids
 
-        project_pipeline_ids = Pipelines(self.client).prefetch_pipeline_ids(self.project)
         LOGGER.info("Fetching all workflow records for Pipelines")
         pipeline_len = len(project_pipeline_ids)
         LOGGER.info("Total Pipelines %s for project %s", pipeline_len, self.project)
-        pipeline_wflo_ids = []
-        for index, pipeline_id in enumerate(project_pipeline_ids):
+        for index, (pipeline_id, parent_ids) in enumerate(
+            self.fan_out(project_pipeline_ids, lambda pipeline_id: self.get_records(pipeline_id, None)[0])
+        ):
             LOGGER.info("Fetching workflows for pipeline *****%s (%s/%s)", pipeline_id[-4:], index, pipeline_len)
-            parent_ids, *_ = self.get_records(pipeline_id, None)
             pipeline_wflo_ids += parent_ids
-        pipeline_wflo_ids.sort(key=lambda x: x[1])
-        self.client.shared_workflow_ids = {self.project: pipeline_wflo_ids}
+            self.remember_workflow_ids(pipeline_id, parent_ids)
+        pipeline_wflo_ids = self.schedule_workflow_ids(pipeline_wflo_ids)
+        if self.client.shared_workflow_ids is None:
+            self.client.shared_workflow_ids = {}
+        self.client.shared_workflow_ids.update({self.project: pipeline_wflo_ids})
         return pipeline_wflo_ids
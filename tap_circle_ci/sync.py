@@ -1,35 +1,116 @@
 """tap-circle-ci sync."""
-from typing import Dict
+from typing import Dict, List, Optional
 
 import singer
 
+from tap_circle_ci import exceptions as errors
 from tap_circle_ci.client import Client
-from tap_circle_ci.streams import STREAMS
+from tap_circle_ci.streams import STREAMS, Pipelines
+from tap_circle_ci.writer import RecordWriter
 
 LOGGER = singer.get_logger()
 
 
+def get_projects(client: Client) -> List[str]:
+    """Returns the projects to be synced.
+
+    With `org_slug` configured the projects are taken from the org wide
+    pipeline listing, optionally narrowed down by `project_slugs`.
+    """
+    projects = list(filter(None, (client.config.get("project_slugs") or "").split(" ")))
+    if client.config.get("org_slug"):
+        org_projects = sorted(Pipelines(client).prefetch_org_pipelines())
+        return [project for project in org_projects if not projects or project in projects]
+    if not projects:
+        raise singer.SingerConfigurationError("Config is missing required keys: either project_slugs or org_slug")
+    return projects
+
+
+def get_watch_interval(config: dict) -> Optional[float]:
+    """Returns the seconds between the syncs of a watch, or None for a single
+    sync."""
+    interval = config.get("watch_interval_seconds")
+    if interval in (None, ""):
+        return None
+    return float(interval)
+
+
 def sync(config :dict, state: Dict, catalog: singer.Catalog):
-    """performs sync for selected streams."""
+    """performs sync for selected streams.
+
+    With `webhook_port` set the records of the webhook events received are
+    emitted instead, until the budget of the run is spent or a SIGTERM is
+    received.
+    """
     client = Client(config)
-    projects = list(filter(None, client.config["project_slugs"].split(" ")))
-    with singer.Transformer() as transformer:
-        for stream in catalog.get_selected_streams(state):
-            tap_stream_id = stream.tap_stream_id
-            stream_schema = stream.schema.to_dict()
-            stream_metadata = singer.metadata.to_map(stream.metadata)
-            stream_obj = STREAMS[tap_stream_id](client)
-            LOGGER.info("Starting sync for stream: %s", tap_stream_id)
-            state = singer.set_currently_syncing(state, tap_stream_id)
-            singer.write_state(state)
-            singer.write_schema(tap_stream_id, stream_schema, stream_obj.key_properties, stream.replication_key)
-            for project in projects:
-                stream_obj.project = project
-                LOGGER.info("Starting sync for project: %s", project)
-                state = stream_obj.sync(
-                    state=state, schema=stream_schema, stream_metadata=stream_metadata, transformer=transformer
-                )
-            singer.write_state(state)
+    webhooks = config.get("webhook_port") not in (None, "")
+    try:
+        if webhooks:
+            # webhook events are filtered by project only when project slugs are set
+            projects = list(filter(None, (config.get("project_slugs") or "").split(" ")))
+        else:
+            projects = get_projects(client)
+        with client.budget.handle_sigterm(), singer.Transformer() as transformer, RecordWriter(config) as writer:
+            try:
+                if webhooks:
+                    from tap_circle_ci.webhooks import receive_webhooks  # pylint: disable=C0415
+
+                    receive_webhooks(client, projects, state, catalog, transformer, writer)
+                else:
+                    state = watch(client, projects, state, catalog, transformer, writer)
+            except errors.BudgetExhaustedError:
+                LOGGER.info("Stopped the sync within its budget, the next run resumes from the last state")
+                writer.write_state(state)
+            except errors.CircuitOpenError:
+                # every bookmark in the state only covers records already handed to the writer
+                LOGGER.error("Stopping the sync, writing the state to resume from")
+                writer.write_state(state)
+                raise
+    finally:
+        client.close()
+
+
+def watch(client: Client, projects: List[str], state: Dict, catalog: singer.Catalog, transformer, writer):
+    """syncs the selected streams, returns the final state.
+
+    With `watch_interval_seconds` set the selected streams are synced again
+    after every interval, with the same client and writer, until the budget
+    of the run is spent or a SIGTERM is received.
+    """
+    # pylint: disable=R0913,R0917
+    watch_interval = get_watch_interval(client.config)
+    state = sync_streams(client, projects, state, catalog, transformer, writer)
+    while watch_interval is not None:
+        LOGGER.info("Waiting %g seconds before the next sync", watch_interval)
+        client.budget.wait(watch_interval)
+        client.budget.check()
+        client.start_cycle()
+        state = sync_streams(client, get_projects(client), state, catalog, transformer, writer)
+    return state
+
+
+def sync_streams(client: Client, projects: List[str], state: Dict, catalog: singer.Catalog, transformer, writer):
+    """syncs the selected streams of every project, returns the final
+    state."""
+    # pylint: disable=R0913,R0917
+    for stream in catalog.get_selected_streams(state):
+        tap_stream_id = stream.tap_stream_id
+        stream_schema = stream.schema.to_dict()
+        stream_metadata = singer.metadata.to_map(stream.metadata)
+        stream_obj = STREAMS[tap_stream_id](client, writer)
+        LOGGER.info("Starting sync for stream: %s", tap_stream_id)
+        state = singer.set_currently_syncing(state, tap_stream_id)
+        writer.write_state(state)
+        writer.write_schema(tap_stream_id, stream_schema, stream_obj.key_properties, stream.replication_key)
+        for project in projects:
+            client.budget.check()
+            stream_obj.project = project
+            LOGGER.info("Starting sync for project: %s", project)
+            state = stream_obj.sync(
+                state=state, schema=stream_schema, stream_metadata=stream_metadata, transformer=transformer
+            )
+        writer.write_state(state)
 
     state = singer.set_currently_syncing(state, None)
-    singer.write_state(state)
+    writer.write_state(state)
+    return state
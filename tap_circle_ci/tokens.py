@@ -0,0 +1,125 @@
+"""tap-circle-ci api token pool module."""
+import threading
+import time
+from typing import Any, List, Mapping, Optional
+
+from singer import get_logger
+
+LOGGER = get_logger()
+
+# the longest a throttled token is left out of rotation without a `Retry-After`
+MAX_THROTTLE_SECONDS = 60
+
+
+class TokenState:
+    """Rate-limit tracking of a single api token."""
+
+    def __init__(self, token: Optional[str]) -> None:
+        self.token = token
+        self.available_at = 0.0
+        self.remaining = None
+        self.throttled = 0
+        self.last_used = 0.0
+        self.revoked = False
+
+
+class TokenPool:
+    """
+    Spreads the requests of a sync across the configured api tokens.
+    ~~~
+    Every request takes the available token with the most remaining rate
+    limit, least recently used first. A token answered with a 429 is left
+    out of rotation for its `Retry-After`, or an exponential delay, while the
+    other tokens keep serving requests. A token answered with a 401 is
+    removed from rotation, unless it is the last one.
+    """
+
+    def __init__(self, tokens: List[Optional[str]]) -> None:
+        self.tokens = [TokenState(token) for token in dict.fromkeys(tokens or [None])]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "TokenPool":
+        """Returns a pool of the `token` and `tokens` of the tap config."""
+        tokens = config.get("tokens") or []
+        if isinstance(tokens, str):
+            tokens = tokens.split(" ")
+        return cls(list(filter(None, [config.get("token"), *tokens])))
+
+    def active(self) -> List[TokenState]:
+        """Returns the tokens still in rotation."""
+        return [state for state in self.tokens if not state.revoked]
+
+    def acquire(self) -> TokenState:
+        """Returns the token for the next request, waiting for one when all
+        of them are throttled."""
+        with self._lock:
+            now = time.monotonic()
+            state = min(
+                self.active(),
+                key=lambda state: (
+                    max(state.available_at - now, 0),
+                    -(state.remaining if state.remaining is not None else float("inf")),
+                    state.last_used,
+                ),
+            )
+            state.last_used = max(now, state.available_at)
+        delay = state.available_at - now
+        if delay > 0:
+            LOGGER.info("All api tokens are rate limited, waiting %.1f seconds", delay)
+            time.sleep(delay)
+        return state
+
+    def is_available(self) -> bool:
+        """Checks if a token can serve a request right away."""
+        now = time.monotonic()
+        return any(state.available_at <= now for state in self.active())
+
+    def update(self, state: TokenState, headers: Mapping[str, str]) -> None:
+        """Tracks the rate limit reported with a successful response."""
+        with self._lock:
+            state.throttled = 0
+            remaining = headers.get("X-RateLimit-Remaining")
+            if remaining is None or not remaining.isdigit():
+                return
+            state.remaining = int(remaining)
+            if state.remaining == 0:
+                state.available_at = time.monotonic() + self.get_reset_delay(headers)
+
+    def throttle(self, state: TokenState, headers: Mapping[str, str]) -> None:
+        """Leaves a token answered with a 429 out of rotation."""
+        with self._lock:
+            state.throttled += 1
+            retry_after = headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = int(retry_after)
+            else:
+                delay = min(2 ** (state.throttled - 1), MAX_THROTTLE_SECONDS)
+            state.available_at = time.monotonic() + delay
+            state.remaining = 0
+        LOGGER.warning("Api token %s is rate limited for %s seconds", self.describe(state), delay)
+
+    def revoke(self, state: TokenState) -> bool:
+        """Removes a token answered with a 401 from rotation, returns False if
+        it is the last one."""
+        with self._lock:
+            if len(self.active()) <= 1:
+                return False
+            state.revoked = True
+        LOGGER.warning("Api token %s was rejected, removing it from rotation", self.describe(state))
+        return True
+
+    @staticmethod
+    def get_reset_delay(headers: Mapping[str, str]) -> float:
+        """Returns the seconds until the rate limit resets, the reset is
+        either a delay or an epoch timestamp."""
+        reset = headers.get("X-RateLimit-Reset") or ""
+        if not reset.isdigit():
+            return 1
+        reset = int(reset)
+        return max(reset - time.time(), 0) if reset > 10 ** 9 else reset
+
+    @staticmethod
+    def describe(state: TokenState) -> str:
+        """Returns a token masked for the logs."""
+        return f"...{state.token[-4:]}" if state.token else "<none>"
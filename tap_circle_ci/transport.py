@@ -0,0 +1,102 @@
+"""tap-circle-ci http/2 transport module."""
+import threading
+from typing import Any, Dict, Mapping, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from singer import SingerConfigurationError, get_logger
+
+from .cassette import wrap_session
+
+LOGGER = get_logger()
+
+HTTP_VERSIONS = ("1.1", "2")
+
+# defaults of the `http2_max_connections` and `http2_max_streams` config
+DEFAULT_MAX_CONNECTIONS = 2
+DEFAULT_MAX_STREAMS = 50
+
+
+def import_httpx():
+    """Returns the httpx module, which is an optional dependency."""
+    try:
+        import h2  # pylint: disable=C0415,W0611
+        import httpx  # pylint: disable=C0415
+    except ImportError as err:
+        raise SingerConfigurationError(
+            "`http_version` 2 requires the httpx and h2 packages, install tap-circle-ci[http2]"
+        ) from err
+    return httpx
+
+
+def to_response(response) -> requests.Response:
+    """Returns an httpx response as a `requests.Response`, so the error
+    handling of the client applies to both transports."""
+    resp = requests.Response()
+    resp.status_code = response.status_code
+    resp.headers = CaseInsensitiveDict(response.headers.multi_items())
+    resp._content = response.content  # pylint: disable=protected-access
+    resp.encoding = response.encoding
+    resp.url = str(response.url)
+    resp.reason = response.reason_phrase
+    return resp
+
+
+class Http2Session:
+    """
+    Sends the requests of a sync over a few multiplexed http/2 connections.
+    ~~~
+    Concurrent pagination and fan-out requests share up to
+    `http2_max_connections` connections instead of opening one each. The
+    requests in flight are limited to `http2_max_streams` per connection,
+    further requests wait for a stream to be released. Responses and
+    transport errors are returned as those of `requests`.
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS, max_streams: int = DEFAULT_MAX_STREAMS) -> None:
+        httpx = import_httpx()
+        self.max_connections = max(max_connections, 1)
+        self.max_streams = max(max_streams, 1)
+        self._transport_errors = (httpx.TransportError,)
+        self._client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            timeout=httpx.Timeout(300),
+        )
+        self._streams = threading.BoundedSemaphore(self.max_connections * self.max_streams)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "Http2Session":
+        """Returns a session with the limits of the tap config."""
+        return cls(
+            int(config.get("http2_max_connections", DEFAULT_MAX_CONNECTIONS)),
+            int(config.get("http2_max_streams", DEFAULT_MAX_STREAMS)),
+        )
+
+    def request(
+        self, method: str, url: str, headers: Optional[Dict] = None, params: Optional[Dict] = None, data: Any = None
+    ) -> requests.Response:
+        """Sends a request on a stream of a pooled connection."""
+        # pylint: disable=R0913,R0917
+        with self._streams:
+            try:
+                response = self._client.request(method, url, headers=headers, params=params, data=data)
+            except self._transport_errors as err:
+                raise requests.ConnectionError(err) from err
+        return to_response(response)
+
+    def close(self) -> None:
+        """Closes the pooled connections."""
+        self._client.close()
+
+
+def get_session(config: Mapping[str, Any]):
+    """Returns the http session configured for the sync, recording to or
+    replaying from a cassette when `cassette_mode` is set."""
+    http_version = str(config.get("http_version") or HTTP_VERSIONS[0])
+    if http_version not in HTTP_VERSIONS:
+        raise SingerConfigurationError(f"http_version must be one of {', '.join(HTTP_VERSIONS)}")
+    if http_version == "2" and config.get("cassette_mode") != "replay":
+        LOGGER.info("Sending requests over http/2")
+        return wrap_session(Http2Session.from_config(config), config)
+    return wrap_session(requests.session(), config)
@@ -0,0 +1,282 @@
+"""tap-circle-ci webhook receiver module.
+
+Instead of polling pipelines for new workflows and jobs, the tap can run a
+local http server receiving the `workflow-completed` and `job-completed`
+webhook events of CircleCI. Every event is verified with the webhook
+secret and emitted as a record of the `workflows` or `jobs` stream, fields
+missing from the payload are fetched from the api.
+"""
+import hashlib
+import hmac
+import json
+import queue
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Mapping, Optional
+
+import requests
+from singer import SingerConfigurationError, Transformer, get_logger, metadata
+
+from .sharding import get_shard, in_shard
+from .streams import Jobs, Workflows
+from .streams.abstracts import Paginator
+
+LOGGER = get_logger()
+
+SIGNATURE_HEADER = "circleci-signature"
+# the stream each event type is emitted to
+EVENT_STREAMS = {"workflow-completed": "workflows", "job-completed": "jobs"}
+
+# defaults of the `webhook_host` and `webhook_port` config
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Returns the signature header of a request body."""
+    return "v1=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret: str, body: bytes, header: Optional[str]) -> bool:
+    """Checks if one of the comma separated signatures of a request matches
+    its body."""
+    expected = sign(secret, body)
+    return any(hmac.compare_digest(expected, signature.strip()) for signature in (header or "").split(","))
+
+
+def to_workflow_record(event: Dict) -> Dict:
+    """Maps a `workflow-completed` event to a record of the workflows
+    schema."""
+    workflow, pipeline, project = event["workflow"], event.get("pipeline") or {}, event.get("project") or {}
+    return {
+        "id": workflow["id"],
+        "name": workflow.get("name"),
+        "status": workflow.get("status"),
+        "created_at": workflow.get("created_at"),
+        "stopped_at": workflow.get("stopped_at"),
+        "pipeline_id": pipeline.get("id"),
+        "pipeline_number": pipeline.get("number"),
+        "project_slug": project.get("slug"),
+    }
+
+
+def to_job_record(event: Dict) -> Dict:
+    """Maps a `job-completed` event to a record of the jobs schema."""
+    job, workflow, project = event["job"], event.get("workflow") or {}, event.get("project") or {}
+    return {
+        "id": job["id"],
+        "job_number": job.get("number"),
+        "name": job.get("name"),
+        "status": job.get("status"),
+        "started_at": job.get("started_at"),
+        "stopped_at": job.get("stopped_at"),
+        "project_slug": project.get("slug"),
+        "_workflow_id": workflow.get("id"),
+        "_pipeline_id": (event.get("pipeline") or {}).get("id"),
+    }
+
+
+def get_missing_fields(record: Dict, schema: Dict, stream_metadata: Dict) -> List[str]:
+    """Returns the selected fields of a stream which are not in a record."""
+    return [
+        field
+        for field in schema["properties"]
+        if field not in record
+        and metadata.get(stream_metadata, ("properties", field), "selected") is not False
+        and metadata.get(stream_metadata, ("properties", field), "inclusion") != "unsupported"
+    ]
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Accepts the signed webhook events posted to the receiver."""
+
+    # seconds a connection may stay idle, so stopping the receiver never waits on a stalled sender
+    timeout = 30
+
+    def do_POST(self):
+        # pylint: disable=C0103
+        """Queues a verified event, answers before it is processed."""
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not verify_signature(self.server.secret, body, self.headers.get(SIGNATURE_HEADER)):
+            LOGGER.warning("Rejected a webhook event with an invalid signature")
+            self.send_response(401)
+            self.end_headers()
+            return
+        try:
+            event = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        if event.get("type") in EVENT_STREAMS:
+            self.server.events.put(event)
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # pylint: disable=W0622
+        LOGGER.debug(format, *args)
+
+
+class WebhookReceiver:
+    """
+    Runs the http server receiving webhook events in a background thread.
+    ~~~
+    Events with a valid signature are queued in `events` in the order they
+    were received, events of other types are acknowledged and dropped.
+    Stopping the receiver waits for the requests being handled, so every
+    acknowledged event is in the queue once it returns.
+    """
+
+    def __init__(self, secret: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        self.server = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.server.daemon_threads = False
+        self.server.secret = secret
+        self.server.events = self.events = queue.Queue()
+        self._thread = threading.Thread(target=self.server.serve_forever, name="webhook-receiver", daemon=True)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "WebhookReceiver":
+        """Returns a receiver with the settings of the tap config."""
+        if not config.get("webhook_secret"):
+            raise SingerConfigurationError("webhook_port requires a webhook_secret")
+        return cls(config["webhook_secret"], config.get("webhook_host") or DEFAULT_HOST, int(config["webhook_port"]))
+
+    @property
+    def url(self) -> str:
+        """Returns the url events are posted to."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> None:
+        """Starts accepting events."""
+        self._thread.start()
+        LOGGER.info("Receiving webhook events on %s", self.url)
+
+    def stop(self) -> None:
+        """Stops accepting events, the events queued are left to process."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class WebhookSync:
+    """Emits the records of the webhook events of the selected streams."""
+
+    def __init__(self, client, writer, catalog, transformer: Transformer, projects: List[str]) -> None:
+        # pylint: disable=R0913,R0917
+        self.client = client
+        self.writer = writer
+        self.transformer = transformer
+        self.projects = projects
+        self.shard = get_shard(client.config)
+        self.streams = {}
+        # jobs listed per workflow, until the workflow completes
+        self.workflow_jobs = {}
+        for stream in catalog.get_selected_streams({}):
+            if stream.tap_stream_id in EVENT_STREAMS.values():
+                schema, stream_metadata = stream.schema.to_dict(), metadata.to_map(stream.metadata)
+                self.streams[stream.tap_stream_id] = (schema, stream_metadata)
+                stream_obj = Workflows if stream.tap_stream_id == "workflows" else Jobs
+                writer.write_schema(stream.tap_stream_id, schema, stream_obj.key_properties, stream.replication_key)
+
+    def fetch_workflow(self, record: Dict) -> Dict:
+        """Returns the workflow of a record from the api."""
+        return self.client.get(Workflows.workflow_url_endpoint.replace("WORKFLOW_ID", record["id"]), {}, {}) or {}
+
+    def fetch_job(self, record: Dict) -> Dict:
+        """Returns the job of a record from the listing of its workflow, the
+        listing is requested again only for jobs it does not hold."""
+        jobs = self.workflow_jobs.get(record["_workflow_id"])
+        if jobs is None or record["id"] not in jobs:
+            url = Jobs.url_endpoint.replace("WORKFLOW_ID", record["_workflow_id"])
+            jobs = {job.get("id"): job for job in Paginator(self.client, url).records()}
+            self.workflow_jobs[record["_workflow_id"]] = jobs
+        return jobs.get(record["id"], {})
+
+    def handle(self, event: Dict, state: Dict) -> Dict:
+        """Emits the record of an event, returns the updated state."""
+        tap_stream_id = EVENT_STREAMS[event["type"]]
+        if tap_stream_id == "workflows":
+            # no more job events are expected for a completed workflow
+            self.workflow_jobs.pop(event["workflow"]["id"], None)
+        if tap_stream_id not in self.streams:
+            return state
+        schema, stream_metadata = self.streams[tap_stream_id]
+        if tap_stream_id == "workflows":
+            record = to_workflow_record(event)
+            pipeline_id = record["pipeline_id"]
+        else:
+            record = to_job_record(event)
+            pipeline_id = record["_pipeline_id"]
+        if self.projects and record["project_slug"] not in self.projects:
+            return state
+        if pipeline_id and not in_shard(pipeline_id, self.shard):
+            return state
+        missing = get_missing_fields(record, schema, stream_metadata)
+        if missing:
+            LOGGER.debug("Fetching %s missing from the %s event", ", ".join(missing), event["type"])
+            fetched = self.fetch_workflow(record) if tap_stream_id == "workflows" else self.fetch_job(record)
+            record = {**fetched, **record}
+        self.writer.write_record(tap_stream_id, record, schema, stream_metadata, self.transformer)
+        if tap_stream_id == "workflows":
+            # a completed workflow no longer needs to be refreshed by the polling syncs
+            stream = Workflows(self.client, self.writer)
+            stream.project = record["project_slug"]
+            open_workflows = stream.get_open_workflows(state)
+            if open_workflows.pop(record["id"], None) is not None:
+                state = stream.write_open_workflows(state, open_workflows)
+        return state
+
+
+def receive_webhooks(client, projects: List[str], state: Dict, catalog, transformer: Transformer, writer) -> None:
+    """Emits the records of the webhook events received until the budget of
+    the run is spent or a SIGTERM is received.
+
+    The budget is checked after every event. Once it is spent the receiver
+    is stopped first, then the events it acknowledged are emitted, so none
+    of them is lost.
+    """
+    # pylint: disable=R0913,R0917
+    receiver = WebhookReceiver.from_config(client.config)
+    webhook_sync = WebhookSync(client, writer, catalog, transformer, projects)
+    receiver.start()
+    pending = False
+    try:
+        while True:
+            try:
+                state = webhook_sync.handle(receiver.events.get(timeout=1), state)
+                pending = True
+            except queue.Empty:
+                pass
+            if pending and receiver.events.empty():
+                # the records received so far are checkpointed once the queue is drained
+                writer.write_state(state)
+                pending = False
+            client.budget.check()
+    finally:
+        receiver.stop()
+        if client.budget.stop_reason is not None:
+            # the events acknowledged before the server stopped are emitted before returning
+            while not receiver.events.empty():
+                state = webhook_sync.handle(receiver.events.get_nowait(), state)
+            writer.write_state(state)
+
+
+def send_event(url: str, secret: str, event: Dict) -> int:
+    """Posts a signed webhook event, as CircleCI does, returns the status
+    code of the response."""
+    body = json.dumps(event).encode("utf-8")
+    response = requests.post(
+        url, data=body, headers={"Content-Type": "application/json", SIGNATURE_HEADER: sign(secret, body)}, timeout=30
+    )
+    return response.status_code
+
+
+def main():
+    """Posts the webhook events of the json files passed as arguments, after
+    the receiver url and the webhook secret."""
+    url, secret, *paths = sys.argv[1:]
+    for path in paths:
+        with open(path, encoding="utf-8") as event_file:
+            print(f"{path}: {send_event(url, secret, json.load(event_file))}")
@@ -0,0 +1,246 @@
+"""tap-circle-ci record writer module."""
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional
+
+import simplejson
+from singer import (
+    Message,
+    RecordMessage,
+    SchemaMessage,
+    SingerConfigurationError,
+    StateMessage,
+    Transformer,
+    format_message,
+    get_logger,
+    write_message,
+)
+
+from tap_circle_ci.queues import BoundedQueue
+
+LOGGER = get_logger()
+
+# transformer of a transform worker process, created on its first batch
+_WORKER_TRANSFORMER = None
+
+
+def serialize_records(stream: str, records: List[Dict], output: str) -> Any:
+    """Serializes transformed records to the output format of a sink.
+
+    `messages` are RECORD message lines, `jsonl` are record lines and
+    `records` leaves the records as they are.
+    """
+    if output == "messages":
+        return "".join(format_message(RecordMessage(stream=stream, record=rec)) + "\n" for rec in records)
+    if output == "jsonl":
+        return "".join(simplejson.dumps(rec, use_decimal=True) + "\n" for rec in records)
+    return records
+
+
+def transform_batch(stream: str, records: List[Dict], schema: Dict, stream_metadata: Dict, output: str) -> Any:
+    """Transforms and serializes a batch of records, runs in a transform
+    worker process."""
+    global _WORKER_TRANSFORMER  # pylint: disable=global-statement
+    if _WORKER_TRANSFORMER is None:
+        _WORKER_TRANSFORMER = Transformer()
+    transformed = [_WORKER_TRANSFORMER.transform(rec, schema, stream_metadata) for rec in records]
+    return serialize_records(stream, transformed, output)
+
+
+class StdoutSink:
+    """Writes records to stdout as RECORD messages."""
+
+    output = "messages"
+
+    def write_records(self, stream: str, payload: str, count: int) -> None:
+        """Writes serialized records of a stream."""
+        # pylint: disable=unused-argument
+        sys.stdout.write(payload)
+
+    def write_message(self, kind: str, text: str) -> None:
+        """Writes a serialized message of type `kind` after the records
+        written before it."""
+        # pylint: disable=unused-argument
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def close(self) -> None:
+        """Completes all the records written."""
+
+
+def get_sink(config: Mapping[str, Any]):
+    """Returns the sink of the records configured for the sync."""
+    if config.get("batch_output_dir") and config.get("parquet_output_dir"):
+        raise SingerConfigurationError("Only one of batch_output_dir and parquet_output_dir can be set")
+    if config.get("parquet_output_dir"):
+        from tap_circle_ci.columnar import ParquetSink  # pylint: disable=C0415
+
+        return ParquetSink.from_config(config)
+    if config.get("batch_output_dir"):
+        from tap_circle_ci.batches import BatchFileSink  # pylint: disable=C0415
+
+        return BatchFileSink.from_config(config)
+    return StdoutSink()
+
+
+class RecordWriter:
+    """
+    Transforms records and writes the singer messages of a sync.
+    ~~~
+    With `transform_workers` set to 0 (the default) every record is transformed
+    and written by the calling thread. Otherwise the sync is split in stages:
+     - the streams fetch and hand records over to the writer
+     - batches of `transform_batch_size` records are transformed and serialized
+       by a pool of `transform_workers` processes
+     - a single writer thread emits the serialized batches, and the other
+       messages, to stdout in the order they were handed over
+
+    Records go to stdout as RECORD messages, or to the sink set by the
+    config, eg: compressed batch files with `batch_output_dir`. Other
+    messages are handed to the sink too, which writes them to stdout once
+    the records handed over before them are completed.
+
+    Batches waiting for stdout are held in a queue bounded by the
+    `max_buffered_records` and `max_buffered_bytes` config, the bytes of a
+    batch are estimated from the size of the records written so far. When
+    the target reading stdout falls behind, the streams block on the writer
+    and stop fetching.
+    """
+
+    # pylint: disable=R0902
+
+    _done = object()
+
+    def __init__(self, config: Optional[Mapping[str, Any]] = None) -> None:
+        config = config or {}
+        self.transform_workers = int(config.get("transform_workers", 0))
+        self.batch_size = int(config.get("transform_batch_size", 500))
+        self._batch_key, self._batch = None, []
+        self._error = None
+        self._record_bytes = 1024
+        self._pool = self._queue = self._thread = None
+        self.sink = get_sink(config)
+        if self.transform_workers > 0:
+            # workers are started on the first batch, once fetch threads are running, forking then is unsafe
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(self.transform_workers, mp_context=multiprocessing.get_context(start_method))
+            self._queue = BoundedQueue.from_config(config)
+            self._thread = threading.Thread(target=self._write_messages, name="record-writer", daemon=True)
+            self._thread.start()
+
+    def write_record(
+        self, stream: str, record: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer
+    ) -> None:
+        """Transforms and writes a record of a stream."""
+        # pylint: disable=R0913,R0917
+        if self._pool is None:
+            record = transformer.transform(record, schema, stream_metadata)
+            if isinstance(self.sink, StdoutSink):
+                write_message(RecordMessage(stream=stream, record=record))
+            else:
+                self.sink.write_records(stream, serialize_records(stream, [record], self.sink.output), 1)
+            return
+        if self._batch_key is not None and self._batch_key[0] != stream:
+            self._submit_batch()
+        self._batch_key = (stream, schema, stream_metadata)
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self._submit_batch()
+
+    def write_message(self, message: Message) -> None:
+        """Writes a message after all the records handed over before it."""
+        kind = message.asdict()["type"]
+        if self._pool is None:
+            if isinstance(self.sink, StdoutSink):
+                write_message(message)
+            else:
+                self.sink.write_message(kind, format_message(message) + "\n")
+            return
+        self._submit_batch()
+        text = format_message(message) + "\n"
+        self._put((kind, text), 0, len(text))
+
+    def write_state(self, state: Dict) -> None:
+        """Writes a state message after all the records handed over before it."""
+        self.write_message(StateMessage(value=state))
+
+    def write_schema(self, stream: str, schema: Dict, key_properties: List, bookmark_properties=None) -> None:
+        """Writes a schema message of a stream."""
+        self.write_message(
+            SchemaMessage(
+                stream=stream, schema=schema, key_properties=key_properties, bookmark_properties=bookmark_properties
+            )
+        )
+
+    def close(self) -> None:
+        """Writes the pending messages and stops the workers."""
+        if self._pool is None:
+            self.sink.close()
+            return
+        try:
+            if self._error is None:
+                self._submit_batch()
+            self._queue.put(self._done)
+            self._thread.join()
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+        self._raise_error()
+        self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except Exception:  # pylint: disable=broad-except
+            # the exception raised by the sync takes precedence
+            if exc_type is None:
+                raise
+
+    @property
+    def record_bytes(self) -> int:
+        """Returns the estimated size of a serialized record."""
+        return self._record_bytes
+
+    def _submit_batch(self) -> None:
+        if not self._batch:
+            return
+        stream, schema, stream_metadata = self._batch_key
+        future = self._pool.submit(transform_batch, stream, self._batch, schema, stream_metadata, self.sink.output)
+        self._put((stream, future, len(self._batch)), len(self._batch), len(self._batch) * self._record_bytes)
+        self._batch_key, self._batch = None, []
+
+    def _put(self, item, records: int, size: int) -> None:
+        self._raise_error()
+        self._queue.put(item, records, size)
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _write_messages(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._done:
+                return
+            if self._error is not None:
+                # the sync is failing, drop what is left
+                continue
+            try:
+                if len(item) == 2:
+                    self.sink.write_message(*item)
+                else:
+                    stream, future, records = item
+                    payload = future.result()
+                    self.sink.write_records(stream, payload, records)
+                    if isinstance(payload, str):
+                        # a moving average of the record size, for the estimates of the following batches
+                        self._record_bytes = (self._record_bytes + len(payload) // records) // 2
+                sys.stdout.flush()
+            except Exception as err:  # pylint: disable=broad-except
+                LOGGER.error("Unable to write records: %s", err)
+                self._error = err
@@ -68,12 +68,26 @@ class CircleCiBaseTest(unittest.TestCase):
                 self.REPLICATION_METHOD: self.FULL_TABLE,
                 self.OBEYS_START_DATE: False,
             },
+            "workflow_runs": {
+                self.PRIMARY_KEYS: {"id"},
+                self.REPLICATION_METHOD: self.INCREMENTAL,
+                self.REPLICATION_KEYS: {"stopped_at"},
+                self.OBEYS_START_DATE: True,
+            },
         }
 
     def expected_streams(self):
         """A set of expected stream names."""
         return set(self.expected_metadata().keys())
 
+    def expected_sync_streams(self):
+        """A set of the stream names with data in the test account.
+
+        `workflow_runs` only lists the runs of the last 90 days, it is left
+        out of the sync tests until the test account has Insights data.
+        """
+        return self.expected_streams() - {"workflow_runs"}
+
     def expected_primary_keys(self):
         """Return a dictionary with key of table name and value as a set of
         primary key fields."""
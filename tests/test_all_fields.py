@@ -23,7 +23,7 @@ class CircleCiAllFields(CircleCiBaseTest):
         """
 
         # Streams to verify all fields tests
-        expected_streams = self.expected_streams()
+        expected_streams = self.expected_sync_streams()
 
         expected_automatic_fields = self.expected_automatic_fields()
         conn_id = connections.ensure_connection(self)
@@ -31,7 +31,7 @@ class CircleCiBookMarkTest(CircleCiBaseTest):
             different values for the replication key
         """
 
-        expected_streams = self.expected_streams()
+        expected_streams = self.expected_sync_streams()
         expected_replication_keys = self.expected_replication_keys()
         expected_replication_methods = self.expected_replication_method()
 
@@ -91,7 +91,7 @@ class CircleCiBookMarkTest(CircleCiBaseTest):
         # Test By Stream
         ##########################################################################
 
-        bookmark_keys = {"pipelines": "project_slug", "workflows": "pipeline_id"}
+        bookmark_keys = {"pipelines": "project_slug", "workflows": "pipeline_id", "workflow_runs": "project_slug"}
 
         for stream in expected_streams:
             with self.subTest(stream=stream):
@@ -236,7 +236,7 @@ class CircleCiBookMarkTest(CircleCiBaseTest):
         data is changed in the future this will break expectations for
         this test.
         """
-        stream_timedelta = {stream: {"seconds": 5} for stream in self.expected_streams()}
+        stream_timedelta = {stream: {"seconds": 5} for stream in self.expected_sync_streams()}
         diff_state = {stream: "" for stream in current_state["bookmarks"].keys()}
         for stream, state in current_state["bookmarks"].items():
             new_state = {}
@@ -24,7 +24,7 @@ class CircleCiStartDateTest(CircleCiBaseTest):
 
         self.start_date = self.start_date_1
 
-        expected_streams = self.expected_streams()
+        expected_streams = self.expected_sync_streams()
 
         ##########################################################################
         # First Sync
@@ -0,0 +1,68 @@
+"""module to test the batch file output of tap-circle-ci."""
+import gzip
+import json
+import tempfile
+from unittest import TestCase
+from urllib.parse import unquote, urlparse
+
+from singer import SingerConfigurationError
+
+from tap_circle_ci.batches import BatchFileSink
+
+from test_sync import records_of, run_sync
+
+
+def read_batch(message):
+    path = unquote(urlparse(message["manifest"][0]).path)
+    opener = gzip.open if message["encoding"]["compression"] == "gzip" else open
+    with opener(path, "rt", encoding="utf-8") as batch_file:
+        return [json.loads(line) for line in batch_file]
+
+
+class BatchOutput(TestCase):
+    """Test cases to verify records are written to batch files announced by
+    BATCH messages."""
+
+    def run_batch_sync(self, config):
+        with tempfile.TemporaryDirectory() as directory:
+            messages = run_sync({"batch_output_dir": directory, **config})
+            batches = {id(msg): read_batch(msg) for msg in messages if msg["type"] == "BATCH"}
+        return messages, batches
+
+    def test_batches_hold_the_records(self):
+        """Unit test to check the batch files hold the same records as a RECORD message sync."""
+        expected = run_sync({})
+        messages, batches = self.run_batch_sync({"batch_max_records": 5})
+        self.assertFalse(records_of(messages, "jobs"))
+        for stream in ("pipelines", "workflows", "jobs"):
+            batched = [
+                rec["id"] for msg in messages if msg["type"] == "BATCH" and msg["stream"] == stream
+                for rec in batches[id(msg)]
+            ]
+            self.assertEqual(batched, records_of(expected, stream))
+        self.assertTrue(all(len(records) <= 5 for records in batches.values()))
+
+    def test_state_follows_batches(self):
+        """Unit test to check every checkpoint is written after the batches of the records it covers."""
+        messages, batches = self.run_batch_sync({"fetch_workers": 3, "transform_workers": 2})
+        seen = set()
+        for msg in messages:
+            if msg["type"] == "BATCH" and msg["stream"] == "jobs":
+                seen.update(rec["_workflow_id"] for rec in batches[id(msg)])
+            if msg["type"] == "STATE":
+                synced = msg["value"].get("bookmarks", {}).get("jobs", {}).get("currently_syncing")
+                if synced:
+                    self.assertIn(synced, seen)
+
+    def test_uncompressed_batches(self):
+        """Unit test to check batch files can be written without compression."""
+        messages, batches = self.run_batch_sync({"batch_compression": "none"})
+        batch = next(msg for msg in messages if msg["type"] == "BATCH")
+        self.assertEqual(batch["encoding"], {"format": "jsonl", "compression": "none"})
+        self.assertTrue(batch["manifest"][0].endswith(".jsonl"))
+        self.assertTrue(batches[id(batch)])
+
+    def test_invalid_compression(self):
+        """Unit test to check an unknown compression is rejected."""
+        with tempfile.TemporaryDirectory() as directory, self.assertRaises(SingerConfigurationError):
+            BatchFileSink(directory, "lz4")
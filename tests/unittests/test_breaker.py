@@ -0,0 +1,89 @@
+"""module to test the circuit breakers of tap-circle-ci."""
+import io
+import json
+from contextlib import redirect_stdout
+from unittest import TestCase, mock
+
+from requests import Response
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.breaker import get_endpoint_class
+from tap_circle_ci.client import Client
+from tap_circle_ci.sync import sync
+
+from test_sync import CONFIG, FakeApi, get_catalog
+
+BASE_URL = "https://circleci.com/api/v2"
+
+
+def response(status_code, content=None):
+    resp = Response()
+    resp.status_code = status_code
+    resp._content = json.dumps(content or {}).encode()  # pylint: disable=protected-access
+    return resp
+
+
+class CircuitBreakers(TestCase):
+    """Test cases to verify failing endpoints stop the sync instead of
+    retrying every request."""
+
+    def test_endpoint_classes(self):
+        """Unit test to check requests are grouped by the endpoint class."""
+        self.assertEqual(get_endpoint_class(f"{BASE_URL}/workflow/abc/job"), "job")
+        self.assertEqual(get_endpoint_class(f"{BASE_URL}/pipeline/abc/workflow"), "workflow")
+        self.assertEqual(get_endpoint_class(f"{BASE_URL}/project/gh/org/repo/pipeline"), "pipeline")
+        self.assertIsNone(get_endpoint_class(f"{BASE_URL}/me"))
+
+    @mock.patch("time.sleep")
+    def test_circuit_opens_after_consecutive_failures(self, _):
+        """Unit test to check an open circuit fails requests of its class without sending them."""
+        client = Client({"token": "abc", "circuit_breaker_threshold": 3})
+        with mock.patch("requests.Session.request", return_value=response(500)) as request:
+            with self.assertRaises(errors.CircuitOpenError):
+                client.get(f"{BASE_URL}/workflow/abc/job", {}, {})
+            self.assertEqual(request.call_count, 3)
+            with self.assertRaises(errors.CircuitOpenError):
+                client.get(f"{BASE_URL}/workflow/def/job", {}, {})
+            self.assertEqual(request.call_count, 3)
+        with mock.patch("requests.Session.request", return_value=response(200, {"items": []})):
+            self.assertEqual(client.get(f"{BASE_URL}/pipeline/abc/workflow", {}, {}), {"items": []})
+
+    @mock.patch("time.sleep")
+    def test_retry_budget(self, _):
+        """Unit test to check the retries of the run are limited by the budget."""
+        client = Client({"token": "abc", "retry_budget": 6, "circuit_breaker_threshold": 0})
+        with mock.patch("requests.Session.request", return_value=response(503)):
+            with self.assertRaises(errors.Http503RequestError):
+                client.get(f"{BASE_URL}/workflow/abc/job", {}, {})
+            with self.assertRaises(errors.RetryBudgetExhaustedError):
+                client.get(f"{BASE_URL}/workflow/def/job", {}, {})
+
+    @mock.patch("time.sleep")
+    def test_sync_checkpoints_on_open_circuit(self, _):
+        """Unit test to check the sync writes the state to resume from before stopping."""
+        api = FakeApi()
+
+        def send(_, url, headers, params):
+            # pylint: disable=unused-argument
+            if url.endswith("/job"):
+                return response(502)
+            return response(200, api.get(url, params, headers))
+
+        config = {**CONFIG, "circuit_breaker_threshold": 5}
+        with mock.patch("requests.Session.request", side_effect=send), redirect_stdout(io.StringIO()) as stdout:
+            with self.assertRaises(errors.CircuitOpenError):
+                sync(config, {}, get_catalog())
+        messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(messages[-1]["type"], "STATE")
+        self.assertEqual(messages[-1]["value"]["currently_syncing"], "jobs")
+        self.assertIn("workflows", messages[-1]["value"]["bookmarks"])
+
+    @mock.patch("time.sleep")
+    def test_rate_limits_not_charged(self, _):
+        """Unit test to check retries of rate limited requests do not spend the retry budget."""
+        client = Client({"token": "abc", "retry_budget": 2})
+        responses = [response(429), response(200, {"items": []})] * 5
+        with mock.patch("requests.Session.request", side_effect=responses):
+            for _ in range(5):
+                self.assertEqual(client.get(f"{BASE_URL}/workflow/abc/job", {}, {}), {"items": []})
+        self.assertEqual(client.breakers.retries, 0)
@@ -0,0 +1,68 @@
+"""module to test the http cassettes of tap-circle-ci."""
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase, mock
+
+from requests import Response
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.client import Client
+from tap_circle_ci.sync import sync
+
+from test_sync import CONFIG, FakeApi, get_catalog
+
+
+def response(content):
+    resp = Response()
+    resp.status_code = 200
+    resp._content = json.dumps(content).encode()  # pylint: disable=protected-access
+    return resp
+
+
+class RecordReplay(TestCase):
+    """Test cases to verify a recorded sync is replayed without the api."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "sync.jsonl.gz")
+
+    def run_sync(self, config, send=None):
+        with mock.patch("requests.Session.request", side_effect=send) as request, \
+                redirect_stdout(io.StringIO()) as stdout:
+            sync({**CONFIG, "cassette_path": self.path, **config}, {}, get_catalog())
+        return stdout.getvalue(), request
+
+    def record(self):
+        api = FakeApi()
+        return self.run_sync(
+            {"cassette_mode": "record"}, lambda _, url, headers, params: response(api.get(url, params, headers))
+        )[0]
+
+    def test_replay_matches_recording(self):
+        """Unit test to check a replayed sync emits the messages of the recorded one without requests."""
+        recorded = self.record()
+        with mock.patch("time.sleep") as sleep:
+            replayed, request = self.run_sync({"cassette_mode": "replay", "cassette_speed": 0})
+        self.assertEqual(replayed, recorded)
+        request.assert_not_called()
+        sleep.assert_not_called()
+
+    def test_accelerated_replay(self):
+        """Unit test to check responses are delayed by their recorded latency divided by the speed."""
+        with mock.patch("tap_circle_ci.cassette.time") as clock:
+            clock.monotonic.side_effect = [0, 2] * 100
+            self.record()
+        with mock.patch("time.sleep") as sleep:
+            self.run_sync({"cassette_mode": "replay", "cassette_speed": 4})
+        self.assertEqual({call.args[0] for call in sleep.call_args_list}, {0.5})
+
+    def test_missing_request(self):
+        """Unit test to check a request absent from the cassette fails."""
+        self.record()
+        client = Client({**CONFIG, "cassette_mode": "replay", "cassette_path": self.path})
+        with self.assertRaises(errors.CassetteMissError):
+            client.get("https://circleci.com/api/v2/me", {}, {})
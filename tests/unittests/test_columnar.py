@@ -0,0 +1,75 @@
+"""module to test the parquet export of tap-circle-ci."""
+import importlib.util
+import io
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import TestCase, mock, skipUnless
+
+from tap_circle_ci.columnar import DEFAULT_PARTITION, ParquetSink, get_partition
+
+from test_sync import FakeApi, records_of, run_sync
+
+
+class Partitions(TestCase):
+    """Test cases to verify records are partitioned by project and date."""
+
+    def test_partition_values(self):
+        """Unit test to check the partition of every stream is taken from its date key."""
+        record = {"project_slug": "gh/org/repo", "created_at": "2023-01-02T10:00:00.000000Z", "started_at": None}
+        self.assertEqual(get_partition("workflows", record), ("gh/org/repo", "2023-01-02"))
+        self.assertEqual(get_partition("jobs", record), ("gh/org/repo", DEFAULT_PARTITION))
+
+
+class StateHoldBack(TestCase):
+    """Test cases to verify STATE messages wait for the parquet files of
+    their records."""
+
+    def get_sink(self, max_records=10):
+        with mock.patch("tap_circle_ci.columnar.import_pyarrow", return_value=(None, None)):
+            with tempfile.TemporaryDirectory() as directory:
+                sink = ParquetSink(directory, max_records=max_records)
+        sink.write_file = mock.Mock()
+        return sink
+
+    def test_state_waits_for_buffered_records(self):
+        """Unit test to check the latest STATE is written once the buffered records are written."""
+        sink = self.get_sink()
+        record = {"project_slug": "gh/org/repo", "created_at": "2023-01-02T10:00:00Z"}
+        with redirect_stdout(io.StringIO()) as stdout:
+            sink.write_message("STATE", "state-0\n")
+            sink.write_records("workflows", [record, record], 2)
+            sink.write_message("STATE", "state-1\n")
+            sink.write_message("STATE", "state-2\n")
+            self.assertEqual(stdout.getvalue(), "state-0\n")
+            sink.close()
+        self.assertEqual(stdout.getvalue(), "state-0\nstate-2\n")
+        sink.write_file.assert_called_once_with("workflows", "gh/org/repo", "2023-01-02", [record, record])
+
+    def test_files_written_at_max_records(self):
+        """Unit test to check the buffered records are written once `parquet_max_records` is reached."""
+        sink = self.get_sink(max_records=3)
+        records = [{"project_slug": "gh/org/repo", "created_at": f"2023-01-0{day}T00:00:00Z"} for day in (1, 2, 2)]
+        sink.write_records("workflows", records, 3)
+        self.assertEqual(sink.write_file.call_count, 2)
+
+
+@skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class ParquetExport(TestCase):
+    """Test cases to verify a sync exports its records to parquet files."""
+
+    def test_export_matches_records(self):
+        """Unit test to check the parquet files hold the records of a RECORD message sync."""
+        import pyarrow as pa  # pylint: disable=C0415
+        import pyarrow.dataset as ds  # pylint: disable=C0415
+        import pyarrow.parquet as pq  # pylint: disable=C0415
+
+        expected = run_sync({})
+        # the fake jobs have no start date, every one of them is in the default partition
+        partitioning = ds.partitioning(pa.schema([("project", pa.string()), ("date", pa.string())]), flavor="hive")
+        with tempfile.TemporaryDirectory() as directory:
+            messages = run_sync({"parquet_output_dir": directory}, api=FakeApi())
+            jobs = pq.read_table(Path(directory) / "jobs", partitioning=partitioning).to_pylist()
+        self.assertFalse(records_of(messages, "jobs"))
+        self.assertTrue(any(msg["type"] == "STATE" for msg in messages))
+        self.assertEqual(sorted(job["id"] for job in jobs), sorted(records_of(expected, "jobs")))
@@ -0,0 +1,102 @@
+"""module to test the adaptive concurrency of tap-circle-ci."""
+import json
+import threading
+from unittest import TestCase, mock
+
+from requests import Response
+
+from tap_circle_ci.client import Client
+from tap_circle_ci.concurrency import AdaptiveConcurrency, get_fetch_workers
+
+from test_sync import records_of, run_sync
+
+
+def response(status_code):
+    resp = Response()
+    resp.status_code = status_code
+    resp._content = json.dumps({"items": []}).encode()  # pylint: disable=protected-access
+    return resp
+
+
+class AdaptiveLimit(TestCase):
+    """Test cases to verify the limit of requests in flight follows the
+    health of the api."""
+
+    def request(self, controller, latency, overloaded=False, now=100.0):
+        with mock.patch("time.monotonic", return_value=now - latency):
+            started = controller.acquire()
+        with mock.patch("time.monotonic", return_value=now):
+            controller.release(started, overloaded)
+
+    def test_fetch_workers_from_config(self):
+        """Unit test to check `auto` runs up to `max_fetch_workers` threads with a controller."""
+        self.assertEqual(get_fetch_workers({"fetch_workers": "auto", "max_fetch_workers": 8}), 8)
+        self.assertEqual(get_fetch_workers({"fetch_workers": "3"}), 3)
+        self.assertIsNone(AdaptiveConcurrency.from_config({"fetch_workers": 3}))
+        self.assertEqual(AdaptiveConcurrency.from_config({"fetch_workers": "auto"}).max_limit, 16)
+
+    def test_additive_increase(self):
+        """Unit test to check healthy responses raise the limit up to its maximum."""
+        controller = AdaptiveConcurrency(max_limit=4)
+        for _ in range(3):
+            self.request(controller, 0.1)
+        self.assertEqual(int(controller.limit), 2)
+        for _ in range(20):
+            self.request(controller, 0.1)
+        self.assertEqual(controller.limit, 4)
+
+    def test_slow_responses_hold_the_limit(self):
+        """Unit test to check responses slower than the baseline latency do not raise the limit."""
+        controller = AdaptiveConcurrency(max_limit=8, initial_limit=4)
+        self.request(controller, 0.1)
+        limit = controller.limit
+        self.request(controller, 1.0)
+        self.assertEqual(controller.limit, limit)
+
+    def test_multiplicative_decrease(self):
+        """Unit test to check overloaded responses halve the limit once per baseline latency."""
+        controller = AdaptiveConcurrency(max_limit=16, initial_limit=8)
+        self.request(controller, 0.5)
+        limit = controller.limit
+        self.request(controller, 0.1, overloaded=True, now=200.0)
+        self.request(controller, 0.1, overloaded=True, now=200.1)
+        self.assertEqual(controller.limit, limit / 2)
+        self.request(controller, 0.1, overloaded=True, now=201.0)
+        self.assertEqual(controller.limit, limit / 4)
+
+    def test_requests_wait_for_the_limit(self):
+        """Unit test to check a request beyond the limit waits for one in flight to finish."""
+        controller = AdaptiveConcurrency(max_limit=4)
+        started = controller.acquire()
+        waiter = threading.Thread(target=controller.acquire)
+        waiter.start()
+        waiter.join(0.1)
+        self.assertTrue(waiter.is_alive())
+        controller.release(started, False)
+        waiter.join(1)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(controller.in_flight, 1)
+
+    def test_limit_metric(self):
+        """Unit test to check the limit is logged as a metric when it changes."""
+        controller = AdaptiveConcurrency(max_limit=4, initial_limit=2)
+        with self.assertLogs(level="INFO") as logs:
+            self.request(controller, 0.1, overloaded=True)
+        self.assertIn('"metric": "fetch_concurrency", "value": 1', logs.output[0])
+
+    @mock.patch("time.sleep")
+    def test_client_throttled_requests(self, _):
+        """Unit test to check the client cuts the limit on a 429."""
+        client = Client({"token": "abc", "fetch_workers": "auto"})
+        client.concurrency.limit = 8
+        with mock.patch("requests.Session.request", side_effect=[response(429), response(200)]):
+            client.get("https://test.com/test", {}, {})
+        self.assertLess(client.concurrency.limit, 8)
+        self.assertEqual(client.concurrency.in_flight, 0)
+
+    def test_auto_sync_matches_serial_sync(self):
+        """Unit test to check a sync with adaptive concurrency emits the records of a serial sync."""
+        serial = run_sync({})
+        adaptive = run_sync({"fetch_workers": "auto", "max_fetch_workers": 4})
+        for stream in ("workflows", "jobs"):
+            self.assertEqual(records_of(adaptive, stream), records_of(serial, stream))
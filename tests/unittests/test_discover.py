@@ -0,0 +1,61 @@
+"""module to test discovery of tap-circle-ci."""
+import json
+from unittest import TestCase, mock
+
+from singer import metadata
+
+from tap_circle_ci import run
+from tap_circle_ci.client import Client
+from tap_circle_ci.discover import discover, get_catalog_entry, load_schema
+
+
+class CachedDiscovery(TestCase):
+    """Test cases to verify schemas are parsed once and the catalog is built
+    without api calls."""
+
+    @mock.patch.object(Client, "get")
+    def test_discover_without_config(self, get):
+        """Unit test to check no auth request is made without a config."""
+        catalog = discover()
+        self.assertEqual({stream.tap_stream_id for stream in catalog.streams}, {"pipelines", "workflows", "jobs", "workflow_runs"})
+        get.assert_not_called()
+
+    def test_schemas_loaded_once(self):
+        """Unit test to check repeated discoveries reuse the parsed schemas."""
+        load_schema.cache_clear()
+        get_catalog_entry.cache_clear()
+        with mock.patch("json.load", wraps=json.load) as json_load:
+            discover()
+            discover()
+        self.assertEqual(json_load.call_count, 4)
+
+    def test_discover_selected_streams(self):
+        """Unit test to check the catalog can be limited to some streams and
+        is not shared between calls."""
+        catalog = discover(stream_names=["jobs"])
+        self.assertEqual([stream.tap_stream_id for stream in catalog.streams], ["jobs"])
+        catalog.streams[0].metadata.append({"breadcrumb": [], "metadata": {"selected": True}})
+        self.assertNotEqual(discover(stream_names=["jobs"]).streams[0].metadata, catalog.streams[0].metadata)
+
+    def test_project_jobs_metadata(self):
+        """Unit test to check jobs of the project builds are discovered as incremental by build number."""
+        with mock.patch.object(Client, "get"):
+            catalog = discover({"token": "abc", "jobs_source": "project"}, stream_names=["jobs"])
+        stream_metadata = metadata.to_map(catalog.streams[0].metadata)
+        self.assertEqual(metadata.get(stream_metadata, (), "forced-replication-method"), "INCREMENTAL")
+        self.assertEqual(metadata.get(stream_metadata, (), "valid-replication-keys"), ["job_number"])
+        self.assertEqual(metadata.get(stream_metadata, ("properties", "job_number"), "inclusion"), "automatic")
+        default = metadata.to_map(discover(stream_names=["jobs"]).streams[0].metadata)
+        self.assertEqual(metadata.get(default, (), "forced-replication-method"), "FULL_TABLE")
+
+    @mock.patch("tap_circle_ci.sync.sync")
+    @mock.patch.object(Client, "get")
+    def test_sync_without_catalog(self, get, sync):
+        """Unit test to check a sync without a catalog discovers with its config
+        and skips the auth request."""
+        config = {"token": "abc", "jobs_source": "project"}
+        run(mock.Mock(discover=False, config=config, state={}, catalog=None))
+        get.assert_not_called()
+        catalog = sync.call_args[0][2]
+        stream_metadata = metadata.to_map(catalog.get_stream("jobs").metadata)
+        self.assertEqual(metadata.get(stream_metadata, (), "forced-replication-method"), "INCREMENTAL")
@@ -0,0 +1,52 @@
+"""module to benchmark the import time of tap-circle-ci."""
+import subprocess
+import sys
+from unittest import TestCase
+
+# an upper bound with plenty of headroom, the package import is expected to take a few milliseconds
+MAX_IMPORT_TIME_US = 50_000
+
+
+def import_times(statement):
+    """Runs the statement in a fresh interpreter and returns the cumulative
+    import time in microseconds of every imported module."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True
+    ).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+class ImportTime(TestCase):
+    """Test cases to verify heavy modules are only loaded by the code paths
+    that need them."""
+
+    def test_package_import(self):
+        """Unit test to check importing the entry point module stays cheap."""
+        times = import_times("import tap_circle_ci")
+        for module in ("singer", "requests", "backoff", "tap_circle_ci.streams", "tap_circle_ci.client"):
+            self.assertNotIn(module, times)
+        self.assertLess(times["tap_circle_ci"], MAX_IMPORT_TIME_US)
+
+    def test_discover_import(self):
+        """Unit test to check discovery does not load the api client or the sync module."""
+        times = import_times("import tap_circle_ci.discover")
+        for module in ("tap_circle_ci.client", "tap_circle_ci.sync"):
+            self.assertNotIn(module, times)
+
+    def test_sync_import(self):
+        """Unit test to check the webhook receiver is only loaded by syncs receiving webhooks."""
+        times = import_times("import tap_circle_ci.sync")
+        for module in ("tap_circle_ci.webhooks", "http.server"):
+            self.assertNotIn(module, times)
+
+    def test_streams_import(self):
+        """Unit test to check stream modules are loaded on first access."""
+        times = import_times("import tap_circle_ci.streams.abstracts")
+        for module in ("tap_circle_ci.streams.pipelines", "tap_circle_ci.streams.jobs"):
+            self.assertNotIn(module, times)
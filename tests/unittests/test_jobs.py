@@ -0,0 +1,134 @@
+"""module to test the jobs stream of tap-circle-ci."""
+import io
+import json
+from contextlib import redirect_stdout
+from unittest import TestCase, mock
+
+from singer import Transformer
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.budget import RunBudget
+from tap_circle_ci.client import Client
+from tap_circle_ci.discover import load_schema
+from tap_circle_ci.sharding import in_shard
+from tap_circle_ci.streams import Jobs
+
+PROJECT = "gh/org/repo"
+
+
+def build(build_num, workflow_id, status="success"):
+    return {
+        "build_num": build_num,
+        "status": status,
+        "queued_at": "2023-01-02T00:00:00Z",
+        "start_time": "2023-01-02T00:00:01Z",
+        "stop_time": "2023-01-02T00:01:00Z",
+        "workflows": {"job_id": f"job-{build_num}", "job_name": "test", "workflow_id": workflow_id,
+                      "upstream_job_ids": []},
+    }
+
+
+class ProjectJobs(TestCase):
+    """Test cases to verify jobs can be synced from the project wide listing
+    of builds."""
+
+    builds = [build(5, "workflow-b", "running"), build(4, "workflow-b"), build(3, "workflow-a"), build(2, "workflow-a")]
+
+    def sync(self, state, shared_workflow_ids=None, **config):
+        client = Client({"token": "abc", "start_date": "2023-01-01T00:00:00Z", "jobs_source": "project", **config})
+        client.shared_workflow_ids = shared_workflow_ids
+        stream = Jobs(client)
+        stream.project_page_size = 2
+        stream.project = PROJECT
+        calls = []
+
+        def get(url, params, _):
+            calls.append((url, dict(params)))
+            if "/api/v1.1/" in url:
+                return self.builds[params["offset"]:params["offset"] + params["limit"]]
+            if url.endswith("/pipeline"):
+                return {"items": [{"id": pipeline_id, "created_at": "2023-01-02T00:00:00Z"}
+                                  for pipeline_id in ("pipeline-a", "pipeline-d")], "next_page_token": None}
+            workflow_id = url.split("/")[-2].replace("pipeline", "workflow")
+            return {"items": [{"id": workflow_id, "pipeline_id": url.split("/")[-2],
+                               "created_at": "2023-01-02T00:00:00Z"}], "next_page_token": None}
+
+        with mock.patch.object(Client, "get", side_effect=get), redirect_stdout(io.StringIO()) as stdout:
+            try:
+                with Transformer() as transformer:
+                    state = stream.sync(state, load_schema("jobs"), {}, transformer)
+            finally:
+                self.messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        records = [msg["record"] for msg in self.messages if msg["type"] == "RECORD"]
+        return state, records, calls
+
+    def test_jobs_mapped_to_workflows(self):
+        """Unit test to check builds are paged by offset and mapped back to their workflow and pipeline."""
+        state, records, calls = self.sync({}, {PROJECT: [("workflow-b", "pipeline-b")]})
+        self.assertEqual([rec["id"] for rec in records], ["job-5", "job-4", "job-3", "job-2"])
+        self.assertEqual(records[0]["_workflow_id"], "workflow-b")
+        self.assertEqual([rec["_pipeline_id"] for rec in records], ["pipeline-b"] * 2 + [None] * 2)
+        self.assertEqual(calls[0][0], "https://circleci.com/api/v1.1/project/github/org/repo")
+        # pipelines of unknown workflows are not requested one by one
+        self.assertEqual([url for url, _ in calls if "/api/v2/" in url], [])
+        # the running job is listed again by the next sync
+        self.assertEqual(state["bookmarks"]["jobs"][PROJECT], 4)
+
+    def test_sharded_pipelines_listed_in_bulk(self):
+        """Unit test to check a sharded sync lists the workflows of its pipelines once, and skips other shards."""
+        self.builds = [build(5, "workflow-d"), build(4, "workflow-d"), build(3, "workflow-a"), build(2, "workflow-a")]
+        self.assertNotEqual(in_shard("pipeline-a", (0, 2)), in_shard("pipeline-d", (0, 2)))
+        _, records, calls = self.sync({}, shard_count=2, shard_index=0 if in_shard("pipeline-a", (0, 2)) else 1)
+        self.assertEqual(
+            [(rec["id"], rec["_pipeline_id"]) for rec in records], [("job-3", "pipeline-a"), ("job-2", "pipeline-a")]
+        )
+        self.assertEqual(len([url for url, _ in calls if url.endswith("/pipeline")]), 1)
+
+    def test_listing_stops_at_bookmark(self):
+        """Unit test to check builds up to the bookmarked build number are not requested again."""
+        _, records, calls = self.sync({"bookmarks": {"jobs": {PROJECT: 4}}})
+        self.assertEqual([rec["id"] for rec in records], ["job-5"])
+        self.assertEqual([params["offset"] for url, params in calls if "/api/v1.1/" in url], [0])
+
+    def test_pages_checkpointed(self):
+        """Unit test to check the offset of the next page is checkpointed after every page."""
+        self.sync({})
+        states = [msg["value"]["bookmarks"]["jobs"] for msg in self.messages if msg["type"] == "STATE"]
+        self.assertEqual(
+            states[0]["page_cursor"],
+            {"parent": PROJECT, "page_token": 2, "branch": None, "max_build": 5, "oldest_open": 5},
+        )
+        self.assertEqual(states[-1], {PROJECT: 4})
+
+    def test_resumes_from_page_cursor(self):
+        """Unit test to check an interrupted listing resumes from its checkpointed offset."""
+        cursor = {"parent": PROJECT, "page_token": 2, "branch": None, "max_build": 5, "oldest_open": 5}
+        state, records, calls = self.sync({"bookmarks": {"jobs": {"page_cursor": cursor}}})
+        self.assertEqual([rec["id"] for rec in records], ["job-3", "job-2"])
+        self.assertEqual([params["offset"] for url, params in calls if "/api/v1.1/" in url], [2, 4])
+        self.assertEqual(state["bookmarks"]["jobs"], {PROJECT: 4})
+
+    def test_budget_stops_between_pages(self):
+        """Unit test to check a spent budget stops the listing at a page checkpoint."""
+        with self.assertRaises(errors.BudgetExhaustedError), mock.patch.object(RunBudget, "count_request"), \
+                mock.patch.object(RunBudget, "check", side_effect=errors.BudgetExhaustedError("stop")):
+            self.sync({})
+        self.assertEqual([msg["record"]["id"] for msg in self.messages if msg["type"] == "RECORD"], ["job-5", "job-4"])
+        self.assertEqual(self.messages[-1]["value"]["bookmarks"]["jobs"]["page_cursor"]["page_token"], 2)
+
+    def test_branch_filter(self):
+        """Unit test to check only the builds of the configured branches are listed."""
+        _, _, calls = self.sync({}, project_branches={PROJECT: "main release/1"})
+        self.assertEqual(
+            sorted({url for url, _ in calls}),
+            ["https://circleci.com/api/v1.1/project/github/org/repo/tree/main",
+             "https://circleci.com/api/v1.1/project/github/org/repo/tree/release%2F1"],
+        )
+
+    def test_unknown_pipelines_warned(self):
+        """Unit test to check a warning is logged when the workflows of the project were not synced."""
+        with mock.patch("tap_circle_ci.streams.jobs.LOGGER") as logger:
+            self.sync({})
+            self.sync({}, {PROJECT: [("workflow-b", "pipeline-b")]})
+        logger.warning.assert_called_once()
+        self.assertIn("_pipeline_id of its jobs is left empty", logger.warning.call_args.args[0])
@@ -0,0 +1,68 @@
+"""module to test the shared paginator of tap-circle-ci."""
+import threading
+from unittest import TestCase
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.streams.abstracts import Paginator
+
+
+class FakeClient:
+    """Serves numbered pages, recording the requested page tokens."""
+
+    def __init__(self, page_count, config=None, fail_on=None):
+        self.config = config or {}
+        self.page_count = page_count
+        self.fail_on = fail_on
+        self.requested = []
+        self.requested_event = threading.Event()
+
+    def get(self, url, params, headers):
+        # pylint: disable=unused-argument
+        page = int(params.get("page-token", 0))
+        self.requested.append(page)
+        self.requested_event.set()
+        if page == self.fail_on:
+            raise errors.Http500RequestError
+        next_token = str(page + 1) if page + 1 < self.page_count else None
+        return {"items": [{"id": f"{page}-{index}"} for index in range(2)], "next_page_token": next_token}
+
+
+class PaginatorTest(TestCase):
+    """Test cases to verify pages are read ahead in order."""
+
+    def test_records_in_order(self):
+        """Unit test to check all the records are yielded in order with or without read-ahead."""
+        for read_ahead in (0, 1, 3):
+            client = FakeClient(4)
+            records = [rec["id"] for rec in Paginator(client, "url", read_ahead=read_ahead).records()]
+            self.assertEqual(records, [f"{page}-{index}" for page in range(4) for index in range(2)])
+            self.assertEqual(client.requested, [0, 1, 2, 3])
+
+    def test_page_tokens(self):
+        """Unit test to check pages carry the token they were requested with."""
+        pages = list(Paginator(FakeClient(3), "url", {"page-token": "1"}).pages())
+        self.assertEqual([(page.token, page.next_token) for page in pages], [("1", "2"), ("2", None)])
+
+    def test_next_page_fetched_while_consuming(self):
+        """Unit test to check the next page is requested while the current one is consumed."""
+        client = FakeClient(3, config={"page_read_ahead": 1})
+        pages = Paginator(client, "url").pages()
+        next(pages)
+        client.requested_event.clear()
+        self.assertTrue(client.requested_event.wait(timeout=5))
+        self.assertEqual(client.requested, [0, 1])
+        pages.close()
+
+    def test_read_ahead_depth(self):
+        """Unit test to check no more than `read_ahead` pages are fetched ahead of the consumer."""
+        client = FakeClient(10)
+        pages = Paginator(client, "url", read_ahead=2).pages()
+        next(pages)
+        threading.Event().wait(0.3)
+        self.assertEqual(client.requested, [0, 1, 2])
+        pages.close()
+
+    def test_errors_are_raised_to_consumer(self):
+        """Unit test to check errors of the background requests are raised while iterating."""
+        with self.assertRaises(errors.Http500RequestError):
+            list(Paginator(FakeClient(3, fail_on=1), "url").records())
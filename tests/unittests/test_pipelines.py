@@ -0,0 +1,197 @@
+"""module to test the pipelines stream of tap-circle-ci."""
+import io
+import json
+from contextlib import redirect_stdout
+from unittest import TestCase, mock
+
+from singer import SingerConfigurationError, Transformer
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.client import Client
+from tap_circle_ci.discover import load_schema
+from tap_circle_ci.streams import Pipelines
+from tap_circle_ci.sync import get_projects
+
+PROJECT = "gh/org/repo"
+
+
+def pipeline(pipeline_id, branch="master", created_at="2023-01-01T00:00:00Z", updated_at=None):
+    return {
+        "id": pipeline_id,
+        "project_slug": PROJECT,
+        "vcs": {"branch": branch},
+        "created_at": created_at,
+        "updated_at": updated_at or created_at,
+    }
+
+
+class BranchFilters(TestCase):
+    """Test cases to verify pipelines are crawled once per configured branch."""
+
+    def get_stream(self, config):
+        stream = Pipelines(Client({"token": "abc", "start_date": "2023-01-01T00:00:00Z", **config}))
+        stream.project = PROJECT
+        return stream
+
+    def test_no_branch_filter(self):
+        """Unit test to check the project is crawled without a branch param by default."""
+        stream = self.get_stream({})
+        with mock.patch.object(Client, "get", return_value={"items": [pipeline("a")], "next_page_token": None}) as get:
+            self.assertEqual([rec["id"] for rec in stream.get_records()], ["a"])
+        self.assertEqual(get.call_count, 1)
+        self.assertNotIn("branch", get.call_args[0][1])
+
+    def test_branch_filters_merge_crawls(self):
+        """Unit test to check every configured branch is crawled and paginated separately."""
+        stream = self.get_stream({"project_branches": {PROJECT: "master develop"}})
+        pages = {
+            ("master", None): {"items": [pipeline("a")], "next_page_token": "next"},
+            ("master", "next"): {"items": [pipeline("b")], "next_page_token": None},
+            ("develop", None): {"items": [pipeline("c", "develop")], "next_page_token": None},
+        }
+        calls = []
+
+        def get(_, params, __):
+            calls.append(dict(params))
+            return pages[(params["branch"], params.get("page-token"))]
+
+        with mock.patch.object(Client, "get", side_effect=get):
+            self.assertEqual([rec["id"] for rec in stream.get_records()], ["a", "b", "c"])
+        self.assertEqual([call["branch"] for call in calls], ["master", "master", "develop"])
+
+    def test_branch_filters_json_string(self):
+        """Unit test to check branch filters can be supplied as a json string."""
+        stream = self.get_stream({"project_branches": '{"gh/org/repo": ["main"], "gh/org/other": "dev"}'})
+        self.assertEqual(stream.get_branches(), ["main"])
+        stream.project = "gh/org/unlisted"
+        self.assertEqual(stream.get_branches(), [None])
+
+
+class OrgListing(TestCase):
+    """Test cases to verify the org wide pipeline listing is routed to
+    projects."""
+
+    def get_client(self, config):
+        return Client({"token": "abc", "start_date": "2023-01-01T00:00:00Z", "org_slug": "gh/org", **config})
+
+    def org_pages(self):
+        other = dict(pipeline("b"), project_slug="gh/org/other")
+        return [
+            {"items": [pipeline("a"), other], "next_page_token": "next"},
+            {"items": [pipeline("c", "develop")], "next_page_token": None},
+        ]
+
+    def test_org_listing_is_fetched_once(self):
+        """Unit test to check every project reads its pipeline ids from a single org crawl."""
+        client = self.get_client({})
+        with mock.patch.object(Client, "get", side_effect=self.org_pages()) as get:
+            self.assertEqual(get_projects(client), ["gh/org/other", PROJECT])
+            stream = Pipelines(client)
+            self.assertEqual(stream.prefetch_pipeline_ids(PROJECT), ["a", "c"])
+            self.assertEqual(stream.prefetch_pipeline_ids("gh/org/other"), ["b"])
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args_list[0][0][0], Pipelines.org_url_endpoint)
+        self.assertEqual(get.call_args_list[0][0][1]["org-slug"], "gh/org")
+        self.assertEqual(client.shared_pipeline_updated_at["b"], "2023-01-01T00:00:00Z")
+
+    def test_org_listing_keeps_ids_only(self):
+        """Unit test to check the org crawl doesn't keep the pipeline records,
+        they are emitted by the crawl of each project."""
+        client = self.get_client({})
+        with mock.patch.object(Client, "get", side_effect=self.org_pages()):
+            get_projects(client)
+        self.assertEqual(client.shared_org_pipelines, {PROJECT: ["a", "c"], "gh/org/other": ["b"]})
+        stream = Pipelines(client)
+        stream.project = PROJECT
+        with mock.patch.object(Client, "get", return_value={"items": [pipeline("a")], "next_page_token": None}) as get:
+            self.assertEqual([rec["id"] for rec in stream.get_records()], ["a"])
+        self.assertEqual(get.call_args[0][0], stream.get_url_endpoint())
+
+    def test_org_listing_filters(self):
+        """Unit test to check project slugs and branch filters narrow down the org listing."""
+        client = self.get_client({"project_slugs": PROJECT, "project_branches": {PROJECT: "develop"}})
+        with mock.patch.object(Client, "get", side_effect=self.org_pages()):
+            self.assertEqual(get_projects(client), [PROJECT])
+            self.assertEqual(client.shared_org_pipelines[PROJECT], ["c"])
+
+
+class FanoutOrder(TestCase):
+    """Test cases to verify parent ids are scheduled by creation time."""
+
+    items = [
+        pipeline("b", created_at="2023-01-02T00:00:00Z"),
+        pipeline("c", created_at="2023-01-03T00:00:00Z"),
+        pipeline("a", created_at="2023-01-01T00:00:00Z"),
+    ]
+
+    def prefetch(self, config):
+        stream = Pipelines(Client({"token": "abc", **config}))
+        with mock.patch.object(Client, "get", return_value={"items": self.items, "next_page_token": None}):
+            return stream.prefetch_pipeline_ids(PROJECT)
+
+    def test_oldest_first_by_default(self):
+        """Unit test to check pipelines are scheduled oldest first by default."""
+        self.assertEqual(self.prefetch({}), ["a", "b", "c"])
+
+    def test_newest_first(self):
+        """Unit test to check pipelines can be scheduled newest first."""
+        self.assertEqual(self.prefetch({"fanout_order": "newest_first"}), ["c", "b", "a"])
+
+    def test_invalid_order(self):
+        """Unit test to check an unknown fanout order is rejected."""
+        with self.assertRaises(SingerConfigurationError):
+            self.prefetch({"fanout_order": "random"})
+
+
+class ResumablePagination(TestCase):
+    """Test cases to verify an interrupted crawl resumes from the
+    checkpointed page."""
+
+    pages = {
+        None: {"items": [pipeline("c", updated_at="2023-01-05T00:00:00Z")], "next_page_token": "page-2"},
+        "page-2": {"items": [pipeline("b", updated_at="2023-01-03T00:00:00Z")], "next_page_token": "page-3"},
+        "page-3": {"items": [pipeline("a", updated_at="2023-01-02T00:00:00Z")], "next_page_token": None},
+    }
+
+    def sync(self, state, fail_on=None):
+        """Runs a pipelines sync, returning the requested tokens, the last
+        written state and the synced record ids."""
+        client = Client({"token": "abc", "start_date": "2023-01-01T00:00:00Z", "page_read_ahead": 0})
+        stream = Pipelines(client)
+        stream.project = PROJECT
+        tokens = []
+
+        def get(_, params, __):
+            tokens.append(params.get("page-token"))
+            if params.get("page-token") == fail_on:
+                raise errors.Http500RequestError
+            return self.pages[params.get("page-token")]
+
+        with mock.patch.object(Client, "get", side_effect=get), redirect_stdout(io.StringIO()) as stdout:
+            try:
+                with Transformer() as transformer:
+                    state = stream.sync(state, load_schema("pipelines"), {}, transformer)
+            except errors.Http500RequestError:
+                pass
+        messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        states = [msg["value"] for msg in messages if msg["type"] == "STATE"]
+        records = [msg["record"]["id"] for msg in messages if msg["type"] == "RECORD"]
+        return tokens, (states or [state])[-1], records, client
+
+    def test_cursor_checkpointed_at_page_boundaries(self):
+        """Unit test to check the next page token and high-water mark are written to the state."""
+        _, state, records, _ = self.sync({}, fail_on="page-3")
+        self.assertEqual(records, ["c", "b"])
+        self.assertEqual(
+            state["bookmarks"]["pipelines"]["page_cursor"],
+            {"parent": PROJECT, "branch": None, "page_token": "page-3", "high_water_mark": "2023-01-05T00:00:00.000000Z"},
+        )
+
+    def test_resume_from_cursor(self):
+        """Unit test to check a restarted sync continues from the saved page."""
+        _, state, _, _ = self.sync({}, fail_on="page-3")
+        tokens, state, records, client = self.sync(state)
+        self.assertEqual(tokens, ["page-3"])
+        self.assertEqual(records, ["a"])
+        self.assertEqual(state["bookmarks"]["pipelines"], {PROJECT: "2023-01-05T00:00:00.000000Z"})
+        self.assertIsNone(client.shared_pipeline_ids)
@@ -0,0 +1,107 @@
+"""module to test the bounded queues between the stages of tap-circle-ci."""
+import threading
+from unittest import TestCase
+
+from tap_circle_ci.client import Client
+from tap_circle_ci.queues import BoundedQueue, QueueClosed
+from tap_circle_ci.streams import Jobs
+
+
+def put_in_thread(queue, *args, **kwargs):
+    thread = threading.Thread(target=queue.put, args=args, kwargs=kwargs, daemon=True)
+    thread.start()
+    thread.join(timeout=0.2)
+    return thread
+
+
+class BoundedQueueTest(TestCase):
+    """Test cases to verify producers wait while the queue is full."""
+
+    def test_records_limit(self):
+        """Unit test to check a put over the records limit waits for a get."""
+        queue = BoundedQueue(max_records=10)
+        queue.put("a", records=6)
+        thread = put_in_thread(queue, "b", records=6)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(queue.get(), "a")
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual((queue.records, queue.get()), (6, "b"))
+
+    def test_bytes_limit(self):
+        """Unit test to check a put over the bytes limit waits for a get."""
+        queue = BoundedQueue(max_bytes=100)
+        queue.put("a", size=60)
+        self.assertTrue(put_in_thread(queue, "b", size=60).is_alive())
+        queue.get()
+
+    def test_oversized_item_accepted_when_empty(self):
+        """Unit test to check an item over the limits does not block an empty queue."""
+        queue = BoundedQueue(max_records=1, max_bytes=1)
+        queue.put("a", records=5, size=5)
+        self.assertEqual(queue.get(), "a")
+
+    def test_close_wakes_producers(self):
+        """Unit test to check blocked producers fail once the queue is closed."""
+        queue = BoundedQueue(max_records=1)
+        queue.put("a", records=1)
+        errors = []
+
+        def put():
+            try:
+                queue.put("b", records=1)
+            except QueueClosed as err:
+                errors.append(err)
+
+        thread = threading.Thread(target=put, daemon=True)
+        thread.start()
+        queue.close()
+        thread.join(timeout=5)
+        self.assertEqual(len(errors), 1)
+
+    def test_reserved_room(self):
+        """Unit test to check reserved room is counted until the item is consumed."""
+        queue = BoundedQueue(max_records=10)
+        queue.put("a", records=2)
+        queue.reserve(records=6)
+        self.assertTrue(put_in_thread(queue, "c", records=6).is_alive())
+        queue.put("b", records=6, reserved=True)
+        self.assertEqual(queue.records, 8)
+        self.assertEqual((queue.get(), queue.get()), ("a", "b"))
+
+
+class FanoutBackpressure(TestCase):
+    """Test cases to verify fetching pauses while fetched records are not
+    consumed."""
+
+    def test_fetching_pauses_for_slow_consumer(self):
+        """Unit test to check no more parents are fetched once the buffered records hit the limit."""
+        stream = Jobs(Client({"token": "abc", "fetch_workers": 2, "max_buffered_records": 10}))
+        fetched = []
+
+        def fetch(parent):
+            fetched.append(parent)
+            return [{"id": f"{parent}-{index}"} for index in range(5)]
+
+        results = stream.fan_out(range(100), fetch)
+        self.assertEqual(next(results)[0], 0)
+        threading.Event().wait(0.3)
+        # the consumed parent, two buffered parents and the in-flight fetches of the two workers
+        self.assertLessEqual(len(fetched), 1 + 2 + 2 * 2)
+        self.assertEqual([parent for parent, _ in results], list(range(1, 100)))
+
+    def test_fetching_pauses_at_bytes_limit(self):
+        """Unit test to check fetched results count against `max_buffered_bytes`, finished fetches included."""
+        stream = Jobs(Client({"token": "abc", "fetch_workers": 4, "max_buffered_bytes": 3 * 1024}))
+        fetched = []
+
+        def fetch(parent):
+            fetched.append(parent)
+            return [{"id": parent}]
+
+        results = stream.fan_out(range(100), fetch)
+        self.assertEqual(next(results)[0], 0)
+        threading.Event().wait(0.3)
+        # the consumed parent, three buffered parents and the results submitted ahead, twice the workers
+        self.assertLessEqual(len(fetched), 1 + 3 + 4 * 2)
+        self.assertEqual([parent for parent, _ in results], list(range(1, 100)))
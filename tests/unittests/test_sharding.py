@@ -0,0 +1,65 @@
+"""module to test sharded syncs of tap-circle-ci."""
+from unittest import TestCase, mock
+
+from singer import SingerConfigurationError
+
+from tap_circle_ci.client import Client
+from tap_circle_ci.sharding import get_shard, in_shard, merge_states
+from tap_circle_ci.streams import Pipelines
+
+
+class Sharding(TestCase):
+    """Test cases to verify pipelines are split deterministically between
+    shards."""
+
+    pipeline_ids = [f"5034460f-c7c4-4c43-9457-de07e2029e{index:02}" for index in range(60)]
+
+    def test_shards_are_disjoint_and_complete(self):
+        """Unit test to check every pipeline is assigned to exactly one shard."""
+        shards = [{pid for pid in self.pipeline_ids if in_shard(pid, (index, 3))} for index in range(3)]
+        self.assertEqual(sorted(set.union(*shards)), self.pipeline_ids)
+        self.assertEqual(sum(len(shard) for shard in shards), len(self.pipeline_ids))
+        self.assertTrue(all(shards))
+
+    def test_get_shard(self):
+        """Unit test to check shard config parsing and validation."""
+        self.assertIsNone(get_shard({}))
+        self.assertEqual(get_shard({"shard_count": "4", "shard_index": "3"}), (3, 4))
+        with self.assertRaises(SingerConfigurationError):
+            get_shard({"shard_count": 2, "shard_index": 2})
+
+    def test_pipelines_filtered_by_shard(self):
+        """Unit test to check the pipelines stream only yields pipelines of its shard."""
+        stream = Pipelines(Client({"token": "abc", "shard_count": 2, "shard_index": 1}))
+        stream.project = "gh/org/repo"
+        items = [{"id": pid} for pid in self.pipeline_ids]
+        with mock.patch.object(Client, "get", return_value={"items": items, "next_page_token": None}):
+            records = [rec["id"] for rec in stream.get_records()]
+        self.assertEqual(records, [pid for pid in self.pipeline_ids if in_shard(pid, (1, 2))])
+
+    def test_merge_states(self):
+        """Unit test to check shard states are merged by latest bookmark."""
+        first = {"bookmarks": {"pipelines": {"gh/org/repo": "2023-01-02T00:00:00.000000Z"},
+                               "workflows": {"a": "2023-01-01T00:00:00.000000Z", "currently_syncing": "a"}}}
+        second = {"bookmarks": {"pipelines": {"gh/org/repo": "2023-01-03T00:00:00.000000Z"},
+                                "workflows": {"b": "2023-01-04T00:00:00.000000Z"}}}
+        self.assertEqual(
+            merge_states(first, second),
+            {"bookmarks": {"pipelines": {"gh/org/repo": "2023-01-03T00:00:00.000000Z"},
+                           "workflows": {"a": "2023-01-01T00:00:00.000000Z", "b": "2023-01-04T00:00:00.000000Z"}}},
+        )
+
+    def test_merge_open_workflows(self):
+        """Unit test to check the open workflows of the shards are combined."""
+        first = {"bookmarks": {}, "open_workflows": {"gh/org/repo": {"w1": ["p1", "2023-01-01"]}}}
+        second = {"bookmarks": {}, "open_workflows": {"gh/org/repo": {"w2": ["p2", "2023-01-02"]}}}
+        self.assertEqual(
+            merge_states(first, second)["open_workflows"],
+            {"gh/org/repo": {"w1": ["p1", "2023-01-01"], "w2": ["p2", "2023-01-02"]}},
+        )
+
+    def test_merge_held_back_bookmarks(self):
+        """Unit test to check the jobs build numbers of the shards are merged by earliest value."""
+        first = {"bookmarks": {"jobs": {"gh/org/repo": 40}}}
+        second = {"bookmarks": {"jobs": {"gh/org/repo": 52}}}
+        self.assertEqual(merge_states(first, second), {"bookmarks": {"jobs": {"gh/org/repo": 40}}})
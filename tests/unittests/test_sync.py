@@ -0,0 +1,269 @@
+"""module to test full syncs of tap-circle-ci."""
+import io
+import json
+import os
+import signal
+from contextlib import redirect_stdout
+from unittest import TestCase, mock
+
+from requests import Response
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.budget import RunBudget
+from tap_circle_ci.client import Client
+from tap_circle_ci.discover import discover
+from tap_circle_ci.streams import Jobs
+from tap_circle_ci.sync import sync
+
+PROJECT = "gh/org/repo"
+CONFIG = {"token": "abc", "start_date": "2023-01-01T00:00:00Z", "project_slugs": PROJECT}
+
+
+class FakeApi:
+    """Serves a project with paginated pipelines, workflows and jobs."""
+
+    def __init__(self, pipeline_count=6, workflow_count=2, job_count=3, page_size=2):
+        self.page_size = page_size
+        self.pipelines = [
+            {"id": f"pipeline-{index}", "project_slug": PROJECT, "number": index,
+             "created_at": f"2023-01-{index + 2:02}T00:00:00Z", "updated_at": f"2023-01-{index + 2:02}T01:00:00Z"}
+            for index in range(pipeline_count)
+        ]
+        self.workflows = {
+            pipeline["id"]: [
+                {"id": f"{pipeline['id']}-workflow-{index}", "pipeline_id": pipeline["id"], "status": "success",
+                 "created_at": pipeline["updated_at"].replace("T01", f"T0{index + 2}")}
+                for index in range(workflow_count)
+            ]
+            for pipeline in self.pipelines
+        }
+        self.jobs = {
+            workflow["id"]: [
+                {"id": f"{workflow['id']}-job-{index}", "job_number": index, "status": "success"}
+                for index in range(job_count)
+            ]
+            for workflows in self.workflows.values()
+            for workflow in workflows
+        }
+        self.urls = []
+
+    def page(self, items, params):
+        start = int(params.get("page-token") or 0)
+        next_token = str(start + self.page_size) if start + self.page_size < len(items) else None
+        return {"items": items[start:start + self.page_size], "next_page_token": next_token}
+
+    def get(self, url, params, headers):
+        # pylint: disable=unused-argument
+        self.urls.append(url)
+        parts = url.split("/")
+        if url.endswith("/workflow"):
+            return self.page(self.workflows.get(parts[-2], []), params)
+        if url.endswith("/job"):
+            return self.page(self.jobs.get(parts[-2], []), params)
+        return self.page(self.pipelines[::-1], params)
+
+
+def get_catalog(stream_names=("pipelines", "workflows", "jobs")):
+    catalog = discover(stream_names=stream_names)
+    for stream in catalog.streams:
+        stream.metadata[0]["metadata"]["selected"] = True
+    return catalog
+
+
+def run_sync(config, state=None, api=None, catalog=None):
+    """Runs a sync against the fake api and returns the parsed messages."""
+    api = api or FakeApi()
+    with mock.patch.object(Client, "get", side_effect=api.get), redirect_stdout(io.StringIO()) as stdout:
+        sync({**CONFIG, **config}, state or {}, catalog or get_catalog())
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+def records_of(messages, stream):
+    return [msg["record"]["id"] for msg in messages if msg["type"] == "RECORD" and msg["stream"] == stream]
+
+
+class StagedSync(TestCase):
+    """Test cases to verify concurrent fetching and pooled transforms emit
+    the same messages as a serial sync."""
+
+    def test_concurrent_sync_matches_serial_sync(self):
+        """Unit test to check the messages are identical and in the same order."""
+        serial = run_sync({})
+        staged = run_sync({"fetch_workers": 4, "transform_workers": 2, "transform_batch_size": 3})
+        self.assertEqual(len(records_of(serial, "jobs")), 36)
+        self.assertEqual(staged, serial)
+
+    def test_state_follows_records(self):
+        """Unit test to check every checkpoint is written after the records it covers."""
+        messages = run_sync({"fetch_workers": 3, "transform_workers": 2, "transform_batch_size": 100})
+        seen = set()
+        for msg in messages:
+            if msg["type"] == "RECORD" and msg["stream"] == "jobs":
+                seen.add(msg["record"]["_workflow_id"])
+            if msg["type"] == "STATE":
+                synced = msg["value"].get("bookmarks", {}).get("jobs", {}).get("currently_syncing")
+                if synced:
+                    self.assertIn(synced, seen)
+
+
+class DeferredRetries(TestCase):
+    """Test cases to verify failed parent fetches are retried after the rest
+    of the fan-out."""
+
+    def failing_api(self, workflow_id, failures):
+        api = FakeApi()
+        get = api.get
+
+        def flaky_get(url, params, headers):
+            nonlocal failures
+            if url.endswith(f"/{workflow_id}/job") and failures:
+                failures -= 1
+                raise errors.Http502RequestError
+            return get(url, params, headers)
+
+        api.get = flaky_get
+        return api
+
+    def test_failed_parent_retried_at_the_end(self):
+        """Unit test to check a failing workflow does not hold up the others and is synced last."""
+        for config in ({}, {"fetch_workers": 3}):
+            messages = run_sync(config, api=self.failing_api("pipeline-3-workflow-0", 1))
+            workflow_ids = list(dict.fromkeys(
+                msg["record"]["_workflow_id"] for msg in messages if msg["type"] == "RECORD" and msg["stream"] == "jobs"
+            ))
+            self.assertEqual(len(workflow_ids), 12)
+            self.assertEqual(workflow_ids[-1], "pipeline-3-workflow-0")
+
+    def test_checkpoint_held_before_failed_parent(self):
+        """Unit test to check the jobs checkpoint does not advance past a workflow still failing."""
+        api = self.failing_api("pipeline-3-workflow-0", 2)
+        with mock.patch.object(Client, "get", side_effect=api.get), redirect_stdout(io.StringIO()) as stdout:
+            with self.assertRaises(errors.Http502RequestError):
+                sync(CONFIG, {}, get_catalog())
+        states = [json.loads(line)["value"] for line in stdout.getvalue().splitlines() if '"STATE"' in line]
+        synced = [state.get("bookmarks", {}).get("jobs", {}).get("currently_syncing") for state in states]
+        self.assertEqual(list(filter(None, synced))[-1], "pipeline-2-workflow-1")
+
+    @mock.patch("time.sleep")
+    def test_deferred_requests_not_retried(self, _):
+        """Unit test to check a deferred fetch sends a single request, read ahead pages included, for
+        server errors and rate limits alike."""
+        for status_code in (500, 429):
+            client, requests = Client({"token": "abc"}), []
+
+            def send(_, url, headers, params, status_code=status_code):
+                # pylint: disable=unused-argument
+                requests.append(url)
+                resp = Response()
+                resp.status_code = status_code if url.endswith("/a/job") and len(requests) == 1 else 200
+                resp._content = json.dumps({"items": [{"id": url}]}).encode()  # pylint: disable=protected-access
+                return resp
+
+            stream = Jobs(client)
+            fetch = lambda parent: stream.get_pages(f"https://circleci.com/api/v2/workflow/{parent}/job")
+            with mock.patch("requests.Session.request", side_effect=send):
+                synced = stream.resumable_fan_out(["a", "b"], fetch)
+                parents = [(parent, len(list(pages))) for parent, pages, _ in synced]
+            self.assertEqual(parents, [("b", 1), ("a", 1)])
+            self.assertEqual(len(requests), 3)
+
+
+class SyncBudget(TestCase):
+    """Test cases to verify a sync stops at a resumable checkpoint once its
+    budget is spent."""
+
+    def run_until_stopped(self, config, state=None, on_request=None):
+        """Runs a sync sending requests to the fake api, returns the parsed
+        messages and the number of requests sent."""
+        api, requests = FakeApi(), []
+
+        def send(_, url, headers, params):
+            requests.append(url)
+            if on_request:
+                on_request(len(requests))
+            resp = Response()
+            resp.status_code = 200
+            resp._content = json.dumps(api.get(url, params, headers)).encode()  # pylint: disable=protected-access
+            return resp
+
+        with mock.patch("requests.Session.request", side_effect=send), redirect_stdout(io.StringIO()) as stdout:
+            sync({**CONFIG, **config}, state or {}, get_catalog())
+        return [json.loads(line) for line in stdout.getvalue().splitlines()], len(requests)
+
+    def test_request_budget_resumes(self):
+        """Unit test to check a sync stopped by `max_requests` resumes without losing records."""
+        expected = run_sync({})
+        messages, request_count = self.run_until_stopped({"max_requests": 10})
+        self.assertLess(request_count, 20)
+        state = [msg["value"] for msg in messages if msg["type"] == "STATE"][-1]
+        self.assertIsNotNone(state["currently_syncing"])
+        resumed, _ = self.run_until_stopped({}, state)
+        for stream in ("workflows", "jobs"):
+            self.assertEqual(
+                set(records_of(messages, stream)) | set(records_of(resumed, stream)), set(records_of(expected, stream))
+            )
+
+    def test_sigterm_checkpoints(self):
+        """Unit test to check a SIGTERM stops the sync at the next checkpoint."""
+        messages, _ = self.run_until_stopped(
+            {}, on_request=lambda count: count == 12 and os.kill(os.getpid(), signal.SIGTERM)
+        )
+        self.assertEqual(messages[-1]["type"], "STATE")
+        self.assertIsNotNone(messages[-1]["value"]["currently_syncing"])
+        self.assertIs(signal.getsignal(signal.SIGTERM), signal.SIG_DFL)
+
+
+class WatchMode(TestCase):
+    """Test cases to verify a watch syncs again on its interval with warm
+    caches."""
+
+    def watch(self, cycles, config=None, catalog=None):
+        """Runs a watch stopped after `cycles` syncs, returns the parsed
+        messages and the urls requested by each sync."""
+        api, urls = FakeApi(), [[]]
+
+        def get(url, params, headers):
+            urls[-1].append(url)
+            return api.get(url, params, headers)
+
+        def wait(budget, seconds):
+            self.assertEqual(seconds, 60)
+            if len(urls) == cycles:
+                budget.stop("Stopping the watch")
+            urls.append([])
+
+        config = {**CONFIG, "watch_interval_seconds": "60", **(config or {})}
+        with mock.patch.object(Client, "get", side_effect=get), mock.patch.object(RunBudget, "wait", wait), \
+                redirect_stdout(io.StringIO()) as stdout:
+            sync(config, {}, catalog or get_catalog())
+        return [json.loads(line) for line in stdout.getvalue().splitlines()], urls[:cycles]
+
+    def test_syncs_until_stopped(self):
+        """Unit test to check every sync of the watch emits its records and ends with a state."""
+        messages, urls = self.watch(3)
+        self.assertEqual(len(urls), 3)
+        self.assertEqual(len(set(records_of(messages, "pipelines"))), 6)
+        self.assertEqual(len(records_of(messages, "jobs")), 36 * 3)
+        self.assertEqual(messages[-1]["type"], "STATE")
+        self.assertIsNone(messages[-1]["value"]["currently_syncing"])
+
+    def test_wait_ends_with_runtime(self):
+        """Unit test to check the wait between syncs does not outlast `max_runtime_seconds`."""
+        budget = RunBudget(max_runtime=5)
+        budget.started -= 4
+        with mock.patch.object(budget, "_stopped") as stopped:
+            budget.wait(60)
+            budget.started -= 2
+            budget.wait(60)
+        (first,), (second,) = [call.args for call in stopped.wait.call_args_list]
+        self.assertLessEqual(first, 1)
+        self.assertEqual(second, 0)
+        with self.assertRaises(errors.BudgetExhaustedError):
+            budget.check()
+
+    def test_known_workflows_not_listed_again(self):
+        """Unit test to check the workflows of pipelines not updated since the last sync are not listed again."""
+        _, urls = self.watch(2, catalog=get_catalog(("pipelines", "jobs")))
+        self.assertEqual(len([url for url in urls[0] if url.endswith("/workflow")]), 6)
+        self.assertEqual([url for url in urls[1] if url.endswith("/workflow")], [])
+        self.assertEqual(len({url for url in urls[1] if url.endswith("/job")}), 12)
@@ -0,0 +1,66 @@
+"""module to test the api token pool of tap-circle-ci."""
+import json
+from unittest import TestCase, mock
+
+from requests import Response
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.client import Client
+from tap_circle_ci.tokens import TokenPool
+
+ENDPOINT = "https://test.com/test"
+
+
+def response(status_code, headers=None):
+    resp = Response()
+    resp.status_code = status_code
+    resp._content = json.dumps({"items": []}).encode()  # pylint: disable=protected-access
+    resp.headers.update(headers or {})
+    return resp
+
+
+class TokenRotation(TestCase):
+    """Test cases to verify requests are spread across the configured
+    tokens."""
+
+    def request(self, client, statuses):
+        """Sends a request, answering each token with its status code, and
+        returns the tokens used."""
+        used = []
+
+        def send(*_, **kwargs):
+            token = kwargs["headers"]["Circle-Token"]
+            used.append(token)
+            return response(statuses.get(token, 200), {"Retry-After": "30"})
+
+        with mock.patch("requests.Session.request", side_effect=send), mock.patch("time.sleep") as sleep:
+            client.get(ENDPOINT, {}, {})
+        return used, sleep
+
+    def test_tokens_from_config(self):
+        """Unit test to check the pool holds the `token` and `tokens` config, without duplicates."""
+        pool = TokenPool.from_config({"token": "a", "tokens": "b a c"})
+        self.assertEqual([state.token for state in pool.tokens], ["a", "b", "c"])
+
+    def test_round_robin(self):
+        """Unit test to check consecutive requests use the least recently used token."""
+        client = Client({"token": "a", "tokens": ["b"]})
+        used = [self.request(client, {})[0][0] for _ in range(4)]
+        self.assertEqual(used, ["a", "b", "a", "b"])
+
+    def test_throttled_token_backs_off_alone(self):
+        """Unit test to check a rate limited token is skipped while the others keep serving requests."""
+        client = Client({"token": "a", "tokens": ["b"]})
+        used, sleep = self.request(client, {"a": 429})
+        self.assertEqual(used, ["a", "b"])
+        sleep.assert_not_called()
+        used, _ = self.request(client, {})
+        self.assertEqual(used, ["b"])
+
+    def test_rejected_token_removed_from_rotation(self):
+        """Unit test to check a token answered with a 401 is no longer used."""
+        client = Client({"token": "a", "tokens": ["b"]})
+        self.assertEqual(self.request(client, {"a": 401})[0], ["a", "b"])
+        self.assertEqual(self.request(client, {})[0], ["b"])
+        with self.assertRaises(errors.Http401RequestError):
+            self.request(client, {"b": 401})
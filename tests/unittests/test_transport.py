@@ -0,0 +1,92 @@
+"""module to test the http/2 transport of tap-circle-ci."""
+import importlib.util
+import sys
+from unittest import TestCase, mock, skipUnless
+
+import requests
+from singer import SingerConfigurationError
+
+import tap_circle_ci.exceptions as errors
+from tap_circle_ci.client import Client
+from tap_circle_ci.transport import Http2Session, get_session, to_response
+
+HAS_HTTPX = all(importlib.util.find_spec(name) for name in ("httpx", "h2"))
+
+
+class SessionConfig(TestCase):
+    """Test cases to verify the transport is picked from the config."""
+
+    def test_default_session(self):
+        """Unit test to check requests are sent over http/1.1 by default."""
+        self.assertIsInstance(get_session({}), requests.Session)
+        self.assertIsInstance(get_session({"http_version": "1.1"}), requests.Session)
+
+    def test_invalid_version(self):
+        """Unit test to check an unknown http version is rejected."""
+        with self.assertRaises(SingerConfigurationError):
+            get_session({"http_version": "3"})
+
+    def test_missing_dependency(self):
+        """Unit test to check http/2 without httpx fails with an install hint."""
+        with mock.patch.dict(sys.modules, {"h2": None, "httpx": None}), \
+                self.assertRaisesRegex(SingerConfigurationError, r"tap-circle-ci\[http2\]"):
+            get_session({"http_version": 2})
+
+
+@skipUnless(HAS_HTTPX, "httpx is not installed")
+class Http2Requests(TestCase):
+    """Test cases to verify responses of the http/2 transport are handled as
+    those of requests."""
+
+    def get_client(self, handler, **config):
+        import httpx  # pylint: disable=C0415
+
+        client = Client({"token": "abc", "http_version": "2", **config})
+        client._session._client = httpx.Client(transport=httpx.MockTransport(handler))  # pylint: disable=W0212
+        return client
+
+    def test_limits_from_config(self):
+        """Unit test to check the connection and stream limits are read from the config."""
+        session = Http2Session.from_config({"http2_max_connections": "4", "http2_max_streams": 10})
+        self.assertEqual((session.max_connections, session.max_streams), (4, 10))
+
+    def test_json_response(self):
+        """Unit test to check a successful response is parsed and the token is sent."""
+        import httpx  # pylint: disable=C0415
+
+        def handler(request):
+            self.assertEqual(request.headers["Circle-Token"], "abc")
+            return httpx.Response(200, json={"items": [1]}, headers={"X-RateLimit-Remaining": "10"})
+
+        self.assertEqual(self.get_client(handler).get("https://test.com/test", {}, {}), {"items": [1]})
+
+    @mock.patch("time.sleep")
+    def test_error_response(self, _):
+        """Unit test to check error statuses raise the errors of the client."""
+        import httpx  # pylint: disable=C0415
+
+        client = self.get_client(lambda request: httpx.Response(403, json={}))
+        with self.assertRaises(errors.Http403RequestError):
+            client.get("https://test.com/test", {}, {})
+
+    def test_response_mapped(self):
+        """Unit test to check the status, headers and body of a response are kept."""
+        import httpx  # pylint: disable=C0415
+
+        response = to_response(httpx.Response(
+            503, content=b"unavailable", headers={"Retry-After": "2"}, request=httpx.Request("GET", "https://test.com")
+        ))
+        self.assertEqual((response.status_code, response.headers["retry-after"]), (503, "2"))
+        self.assertEqual((response.text, response.url), ("unavailable", "https://test.com"))
+
+    def test_transport_error(self):
+        """Unit test to check transport errors are raised as the connection errors of requests."""
+        import httpx  # pylint: disable=C0415
+
+        def handler(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        session = Http2Session()
+        session._client = httpx.Client(transport=httpx.MockTransport(handler))  # pylint: disable=W0212
+        with self.assertRaises(requests.ConnectionError):
+            session.request("GET", "https://test.com/test")
@@ -0,0 +1,136 @@
+"""module to test the webhook receiver of tap-circle-ci."""
+import io
+import json
+import os
+import signal
+from contextlib import redirect_stdout
+from unittest import TestCase, mock
+
+from tap_circle_ci.client import Client
+from tap_circle_ci.sync import sync
+from tap_circle_ci.webhooks import WebhookReceiver, send_event, sign, verify_signature
+
+from test_sync import CONFIG, PROJECT, get_catalog, records_of
+
+SECRET = "webhook-secret"
+
+
+def workflow_event(workflow_id, status="success"):
+    return {
+        "type": "workflow-completed",
+        "happened_at": "2023-01-02T10:05:00Z",
+        "project": {"slug": PROJECT},
+        "pipeline": {"id": "pipeline-1", "number": 1},
+        "workflow": {"id": workflow_id, "name": "build", "status": status,
+                     "created_at": "2023-01-02T10:00:00Z", "stopped_at": "2023-01-02T10:05:00Z"},
+    }
+
+
+def job_event(job_id, workflow_id):
+    return {
+        "type": "job-completed",
+        "happened_at": "2023-01-02T10:04:00Z",
+        "project": {"slug": PROJECT},
+        "pipeline": {"id": "pipeline-1", "number": 1},
+        "workflow": {"id": workflow_id, "name": "build"},
+        "job": {"id": job_id, "number": 7, "name": "test", "status": "success",
+                "started_at": "2023-01-02T10:01:00Z", "stopped_at": "2023-01-02T10:04:00Z"},
+    }
+
+
+class Signatures(TestCase):
+    """Test cases to verify events are authenticated with the webhook
+    secret."""
+
+    def test_verify_signature(self):
+        """Unit test to check only a signature of the body with the secret is accepted."""
+        body = b'{"type": "job-completed"}'
+        self.assertTrue(verify_signature(SECRET, body, sign(SECRET, body)))
+        self.assertTrue(verify_signature(SECRET, body, f"v1=abc,{sign(SECRET, body)}"))
+        self.assertFalse(verify_signature(SECRET, body, sign("other", body)))
+        self.assertFalse(verify_signature(SECRET, body, None))
+
+    def test_receiver_rejects_unsigned_events(self):
+        """Unit test to check the receiver queues signed events only."""
+        receiver = WebhookReceiver(SECRET, port=0)
+        receiver.start()
+        try:
+            self.assertEqual(send_event(receiver.url, "other", workflow_event("wf-1")), 401)
+            self.assertEqual(send_event(receiver.url, SECRET, {"type": "ping"}), 202)
+            self.assertEqual(send_event(receiver.url, SECRET, workflow_event("wf-2")), 202)
+        finally:
+            receiver.stop()
+        self.assertEqual(receiver.events.get_nowait()["workflow"]["id"], "wf-2")
+        self.assertTrue(receiver.events.empty())
+
+
+class WebhookSync(TestCase):
+    """Test cases to verify the records of received events are emitted."""
+
+    def receive(self, events, catalog=None, state=None):
+        """Runs the tap in webhook mode, sends the events and stops it, returns
+        the parsed messages and the urls requested from the api."""
+        urls = []
+        start = WebhookReceiver.start
+
+        def get(url, params, headers):
+            # pylint: disable=unused-argument
+            urls.append(url)
+            if url.endswith("/job"):
+                return {"items": [{"id": "job-1", "type": "build", "dependencies": ["job-0"]}], "next_page_token": None}
+            return {"id": url.split("/")[-1], "started_by": "user-1", "tag": None, "name": "stale"}
+
+        def start_and_send(receiver):
+            start(receiver)
+            for event in events:
+                send_event(receiver.url, SECRET, event)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        config = {**CONFIG, "webhook_port": 0, "webhook_secret": SECRET}
+        with mock.patch.object(Client, "get", side_effect=get), \
+                mock.patch.object(WebhookReceiver, "start", start_and_send), redirect_stdout(io.StringIO()) as stdout:
+            sync(config, state or {}, catalog or get_catalog(("workflows", "jobs")))
+        return [json.loads(line) for line in stdout.getvalue().splitlines()], urls
+
+    def test_records_from_payloads(self):
+        """Unit test to check events are emitted as records, with the fields missing from the payload fetched."""
+        messages, urls = self.receive([workflow_event("wf-1"), job_event("job-1", "wf-1")])
+        self.assertEqual(records_of(messages, "workflows"), ["wf-1"])
+        self.assertEqual(records_of(messages, "jobs"), ["job-1"])
+        workflow, job = [msg["record"] for msg in messages if msg["type"] == "RECORD"]
+        self.assertEqual((workflow["name"], workflow["started_by"]), ("build", "user-1"))
+        self.assertEqual((job["_workflow_id"], job["type"], job["dependencies"]), ("wf-1", "build", ["job-0"]))
+        self.assertEqual(len(urls), 2)
+        self.assertEqual(messages[-1]["type"], "STATE")
+
+    def test_acknowledged_events_emitted_on_stop(self):
+        """Unit test to check the events queued when the sync is stopped are emitted before the last state."""
+        events = [workflow_event(f"wf-{index}") for index in range(5)]
+        messages, _ = self.receive(events, get_catalog(("workflows",)))
+        self.assertEqual(records_of(messages, "workflows"), [f"wf-{index}" for index in range(5)])
+        self.assertEqual(messages[-1]["type"], "STATE")
+
+    def test_workflow_jobs_listed_once(self):
+        """Unit test to check the jobs of a workflow are listed once for all of its job events."""
+        events = [job_event("job-1", "wf-1"), job_event("job-1", "wf-1"), workflow_event("wf-1"),
+                  job_event("job-1", "wf-1")]
+        messages, urls = self.receive(events, get_catalog(("jobs",)))
+        self.assertEqual(records_of(messages, "jobs"), ["job-1"] * 3)
+        # the listing is dropped once the workflow completes
+        self.assertEqual(len([url for url in urls if url.endswith("/wf-1/job")]), 2)
+
+    def test_no_fetch_for_deselected_fields(self):
+        """Unit test to check the api is not called when the payload holds every selected field."""
+        catalog = get_catalog(("workflows",))
+        for entry in catalog.streams[0].metadata:
+            if entry["breadcrumb"] and entry["breadcrumb"][1] in ("started_by", "errored_by", "canceled_by", "tag"):
+                entry["metadata"]["selected"] = False
+        messages, urls = self.receive([workflow_event("wf-1")], catalog)
+        self.assertEqual(records_of(messages, "workflows"), ["wf-1"])
+        self.assertEqual(urls, [])
+
+    def test_completed_workflow_no_longer_open(self):
+        """Unit test to check a completed workflow is removed from the open workflows of the state."""
+        state = {"bookmarks": {}, "open_workflows": {PROJECT: {"wf-1": ["pipeline-1", "2023-01-02"]}}}
+        messages, _ = self.receive([workflow_event("wf-1")], state=state)
+        self.assertNotIn("open_workflows", messages[-1]["value"])
@@ -0,0 +1,76 @@
+"""module to test the workflow runs stream of tap-circle-ci."""
+import io
+import json
+from contextlib import redirect_stdout
+from datetime import timedelta
+from unittest import TestCase, mock
+
+from singer import Transformer
+from singer.utils import now, strftime
+
+from tap_circle_ci.client import Client
+from tap_circle_ci.discover import load_schema
+from tap_circle_ci.streams import WorkflowRuns
+
+PROJECT = "gh/org/repo"
+
+
+def days_ago(days):
+    return strftime(now() - timedelta(days=days))
+
+
+class InsightsRuns(TestCase):
+    """Test cases to verify workflow runs are listed per workflow name for the
+    whole project."""
+
+    runs = {
+        "build": [{"id": "run-1", "status": "success", "created_at": days_ago(2), "stopped_at": days_ago(2)}],
+        "deploy%2Fprod": [
+            {"id": "run-2", "status": "failed", "created_at": days_ago(1.5), "stopped_at": days_ago(1)},
+            {"id": "run-3", "status": "success", "created_at": days_ago(5), "stopped_at": days_ago(5)},
+        ],
+    }
+
+    def sync(self, state):
+        client = Client({"token": "abc", "start_date": days_ago(30)})
+        stream = WorkflowRuns(client)
+        stream.project = PROJECT
+        calls = []
+
+        def get(url, params, _):
+            calls.append((url, dict(params)))
+            if url.endswith("/workflows"):
+                return {"items": [{"name": "deploy/prod"}, {"name": "build"}], "next_page_token": None}
+            return {"items": self.runs[url.split("/")[-1]], "next_page_token": None}
+
+        with mock.patch.object(Client, "get", side_effect=get), redirect_stdout(io.StringIO()) as stdout:
+            with Transformer() as transformer:
+                state = stream.sync(state, load_schema("workflow_runs"), {}, transformer)
+        records = [json.loads(line)["record"] for line in stdout.getvalue().splitlines() if '"RECORD"' in line]
+        return state, records, calls
+
+    def test_runs_of_every_workflow(self):
+        """Unit test to check one listing per workflow name is requested and runs are tagged with it."""
+        state, records, calls = self.sync({})
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[1][0], "https://circleci.com/api/v2/insights/gh/org/repo/workflows/build")
+        self.assertEqual(calls[1][1]["all-branches"], "true")
+        self.assertEqual([(rec["id"], rec["name"]) for rec in records],
+                         [("run-1", "build"), ("run-2", "deploy/prod"), ("run-3", "deploy/prod")])
+        self.assertEqual(state["bookmarks"]["workflow_runs"][PROJECT], records[1]["stopped_at"])
+
+    def test_runs_before_bookmark_skipped(self):
+        """Unit test to check runs stopped before the project bookmark are not emitted, and runs are listed from
+        the lookback window before it."""
+        state = {"bookmarks": {"workflow_runs": {PROJECT: days_ago(3)}}}
+        _, records, calls = self.sync(state)
+        self.assertEqual([rec["id"] for rec in records], ["run-1", "run-2"])
+        self.assertEqual(calls[1][1]["start-date"][:10], days_ago(4)[:10])
+
+    def test_runs_completed_after_later_runs(self):
+        """Unit test to check a run created before the bookmark but completed after it is emitted."""
+        self.runs = {**self.runs, "build": [{"id": "run-4", "created_at": days_ago(1.5), "stopped_at": days_ago(0.5)}]}
+        state = {"bookmarks": {"workflow_runs": {PROJECT: days_ago(1.2)}}}
+        state, records, _ = self.sync(state)
+        self.assertEqual([rec["id"] for rec in records], ["run-4", "run-2"])
+        self.assertEqual(state["bookmarks"]["workflow_runs"][PROJECT], records[0]["stopped_at"])
@@ -0,0 +1,132 @@
+"""module to test the workflows stream of tap-circle-ci."""
+import io
+from contextlib import redirect_stdout
+from unittest import TestCase, mock
+
+from singer import Transformer
+
+from tap_circle_ci.client import Client
+from tap_circle_ci.discover import load_schema
+from tap_circle_ci.streams import Workflows
+
+PROJECT = "gh/org/repo"
+START_DATE = "2023-01-01T00:00:00Z"
+
+
+def workflow(workflow_id, pipeline_id, created_at):
+    return {"id": workflow_id, "pipeline_id": pipeline_id, "created_at": created_at, "status": "success"}
+
+
+class FakeApi:
+    """Serves pipelines and their workflows, recording the requested urls."""
+
+    def __init__(self, pipelines, workflows):
+        self.pipelines = pipelines
+        self.workflows = workflows
+        self.urls = []
+        self.current = {}
+
+    def get(self, url, params, headers):
+        # pylint: disable=unused-argument
+        self.urls.append(url)
+        if url.endswith("/workflow"):
+            pipeline_id = url.split("/")[-2]
+            return {"items": self.workflows.get(pipeline_id, []), "next_page_token": None}
+        if "/workflow/" in url:
+            return self.current.get(url.split("/")[-1], {"items": []})
+        return {"items": self.pipelines, "next_page_token": None}
+
+    def workflow_requests(self):
+        return [url.split("/")[-2] for url in self.urls if url.endswith("/workflow")]
+
+
+class WorkflowFanoutPruning(TestCase):
+    """Test cases to verify workflows are not requested for pipelines updated
+    before their bookmark."""
+
+    pipelines = [
+        {"id": "pipeline-old", "created_at": "2023-01-01T12:00:00Z", "updated_at": "2023-01-01T12:00:00Z"},
+        {"id": "pipeline-new", "created_at": "2023-01-03T00:00:00Z", "updated_at": "2023-01-05T00:00:00Z"},
+    ]
+    workflows = {
+        "pipeline-old": [workflow("workflow-1", "pipeline-old", "2023-01-01T12:00:05Z")],
+        "pipeline-new": [workflow("workflow-2", "pipeline-new", "2023-01-05T00:00:00Z")],
+    }
+    state = {"bookmarks": {"workflows": {
+        "pipeline-old": "2023-01-01T12:00:05.000000Z", "pipeline-new": "2023-01-03T00:00:00.000000Z"
+    }}}
+
+    def sync(self, api, state):
+        client = Client({"token": "abc", "start_date": START_DATE, "project_slugs": PROJECT})
+        stream = Workflows(client)
+        stream.project = PROJECT
+        with mock.patch.object(Client, "get", side_effect=api.get), redirect_stdout(io.StringIO()) as stdout:
+            with Transformer() as transformer:
+                state = stream.sync(state, load_schema("workflows"), {}, transformer)
+        return client, stream, state, stdout.getvalue()
+
+    def test_unchanged_pipelines_are_skipped(self):
+        """Unit test to check only pipelines updated after their bookmark are requested."""
+        api = FakeApi(self.pipelines, self.workflows)
+        _, _, state, output = self.sync(api, self.state)
+        self.assertEqual(api.workflow_requests(), ["pipeline-new"])
+        self.assertIn("workflow-2", output)
+        self.assertEqual(state["bookmarks"]["workflows"]["pipeline-new"], "2023-01-05T00:00:00.000000Z")
+
+    def test_skipped_pipelines_listed_for_jobs(self):
+        """Unit test to check the workflow ids shared with jobs include the skipped pipelines."""
+        api = FakeApi(self.pipelines, self.workflows)
+        client, stream, _, _ = self.sync(api, self.state)
+        with mock.patch.object(Client, "get", side_effect=api.get):
+            workflow_ids = stream.prefetch_workflow_ids(PROJECT)
+        self.assertEqual(sorted(workflow_ids), [("workflow-1", "pipeline-old"), ("workflow-2", "pipeline-new")])
+        self.assertEqual(api.workflow_requests(), ["pipeline-new", "pipeline-old"])
+        self.assertEqual(client.unlisted_pipeline_ids, {})
+
+    def test_first_sync_requests_all_pipelines(self):
+        """Unit test to check every pipeline is requested without bookmarks."""
+        api = FakeApi(self.pipelines, self.workflows)
+        self.sync(api, {})
+        self.assertEqual(sorted(api.workflow_requests()), ["pipeline-new", "pipeline-old"])
+
+    def test_workflow_ids_follow_pipeline_order(self):
+        """Unit test to check the workflow ids shared with jobs follow the fan-out order of pipelines."""
+        api = FakeApi(self.pipelines, self.workflows)
+        client, *_ = self.sync(api, {})
+        self.assertEqual(
+            client.shared_workflow_ids[PROJECT], [("workflow-1", "pipeline-old"), ("workflow-2", "pipeline-new")]
+        )
+
+
+class OpenWorkflows(TestCase):
+    """Test cases to verify unfinished workflows are refreshed on the
+    following syncs."""
+
+    pipelines = [{"id": "pipeline-1", "created_at": "2023-01-02T00:00:00Z", "updated_at": "2023-01-02T00:00:00Z"}]
+    running = dict(workflow("workflow-1", "pipeline-1", "2023-01-02T00:00:05Z"), status="running")
+
+    def sync(self, api, state):
+        config = {"token": "abc", "start_date": START_DATE, "project_slugs": PROJECT,
+                  "open_workflow_max_age_days": 100000}
+        stream = Workflows(Client(config))
+        stream.project = PROJECT
+        with mock.patch.object(Client, "get", side_effect=api.get), redirect_stdout(io.StringIO()) as stdout:
+            with Transformer() as transformer:
+                state = stream.sync(state, load_schema("workflows"), {}, transformer)
+        return state, stdout.getvalue()
+
+    def test_unfinished_workflows_refreshed(self):
+        """Unit test to check a running workflow is fetched again, without its pipeline, until it finishes."""
+        api = FakeApi(self.pipelines, {"pipeline-1": [self.running]})
+        state, _ = self.sync(api, {})
+        self.assertEqual(
+            state["open_workflows"],
+            {PROJECT: {"workflow-1": ["pipeline-1", "2023-01-02T00:00:05Z"]}},
+        )
+        api.urls.clear()
+        api.current["workflow-1"] = dict(self.running, status="success")
+        state, output = self.sync(api, state)
+        self.assertEqual(api.workflow_requests(), [])
+        self.assertIn('"status": "success"', output)
+        self.assertNotIn("open_workflows", state)
+        self.assertTrue(all(isinstance(value, str) for value in state["bookmarks"]["workflows"].values()))